@@ -1,5 +1,25 @@
-# app.py
+import os
+
+import plotly.io as pio
 from dash import Dash
 
-app = Dash(__name__, suppress_callback_exceptions=True)
+# Dash encodes every callback response with plotly's JSON encoder. 'auto' picks orjson, which
+# encodes numpy arrays natively, when it is installed; FIGURE_JSON_ENGINE=json forces the stdlib.
+pio.json.config.default_engine = os.environ.get('FIGURE_JSON_ENGINE', 'auto')
+
+# Heavy callbacks run as background callbacks in a local process pool when diskcache is installed;
+# BACKGROUND_CALLBACKS=0 runs them inline in the request instead
+try:
+    if os.environ.get('BACKGROUND_CALLBACKS', '1') == '0':
+        raise ImportError('background callbacks turned off')
+    import diskcache
+    from dash import DiskcacheManager
+
+    background_callback_manager = DiskcacheManager(diskcache.Cache(
+        os.environ.get('BACKGROUND_CALLBACK_CACHE', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                 '.cache', 'callbacks'))))
+except ImportError:
+    background_callback_manager = None
+
+app = Dash(__name__, suppress_callback_exceptions=True, background_callback_manager=background_callback_manager)
 server = app.server
@@ -0,0 +1,140 @@
+import csv
+import io
+import itertools
+import json
+
+import numpy as np
+import pandas as pd
+from flask import Response, jsonify, request, stream_with_context
+
+from app import app
+from apps.datasets import DATASETS, get_dataset, memory_report, parameters
+
+# Rows classified per KD-tree query and per streamed chunk
+BATCH_SIZE = 10000
+
+# Errors caused by the uploaded batch rather than by the server
+INPUT_ERRORS = (ValueError, TypeError, KeyError, pd.errors.ParserError)
+_EMPTY_VALUES = "Parameter vectors must not contain empty values."
+
+
+def _error(message, status=400):
+    return jsonify({'error': message}), status
+
+
+def _json_rows(payload):
+    if not isinstance(payload, list):
+        raise ValueError("Expected a JSON array of parameter vectors.")
+    if not payload:
+        return []
+    if isinstance(payload[0], dict):
+        missing = [param for param in parameters if param not in payload[0]]
+        if missing:
+            raise ValueError(f"Missing parameters: {', '.join(missing)}")
+        payload = [[row[param] for param in parameters] for row in payload]
+    matrix = np.asarray(payload, dtype=np.float64)
+    if matrix.ndim != 2 or matrix.shape[1] != len(parameters):
+        raise ValueError(f"Each vector needs {len(parameters)} values in the order {parameters}.")
+    # the whole batch is in memory already, so every row is checked before the response starts
+    if np.isnan(matrix).any():
+        raise ValueError(_EMPTY_VALUES)
+    return [matrix[start:start + BATCH_SIZE] for start in range(0, len(matrix), BATCH_SIZE)]
+
+
+def _csv_chunks(stream):
+    reader = pd.read_csv(stream, chunksize=BATCH_SIZE)
+    first = next(reader, None)
+    if first is None:
+        return []
+    missing = [param for param in parameters if param not in first.columns]
+    if missing:
+        raise ValueError(f"Missing CSV columns: {', '.join(missing)}")
+    return (chunk[parameters].to_numpy(dtype=np.float64) for chunk in itertools.chain([first], reader))
+
+
+def _classify(dataset, chunks):
+    for matrix in chunks:
+        if np.isnan(matrix).any():
+            raise ValueError(_EMPTY_VALUES)
+        distances, rows, clusters = dataset.nearest_index.query(dataset.normalize_inputs(matrix))
+        yield dataset.index[rows].tolist(), clusters.tolist(), distances.tolist()
+
+
+def _stream_error(e):
+    if isinstance(e, INPUT_ERRORS):
+        return str(e)
+    print(f"Error classifying a batch: {e}")
+    return "The batch could not be classified."
+
+
+def _stream_json(results):
+    yield '['
+    first = True
+    try:
+        for designs, clusters, distances in results:
+            rows = [json.dumps({'design': design, 'cluster': cluster, 'distance': distance})
+                    for design, cluster, distance in zip(designs, clusters, distances)]
+            if rows:
+                yield ('' if first else ',') + ','.join(rows)
+                first = False
+    except Exception as e:
+        # the 200 status is sent already: end the array with an error object instead of cutting it off
+        yield ('' if first else ',') + json.dumps({'error': _stream_error(e)})
+    yield ']'
+
+
+def _csv_row(values):
+    row = io.StringIO()
+    csv.writer(row, lineterminator='\n').writerow(values)
+    return row.getvalue()
+
+
+def _stream_csv(results):
+    yield 'design,cluster,distance\n'
+    try:
+        for designs, clusters, distances in results:
+            yield ''.join(f'{design},{cluster},{distance!r}\n'
+                          for design, cluster, distance in zip(designs, clusters, distances))
+    except Exception as e:
+        # the 200 status is sent already: end with an error row instead of cutting the body off
+        yield _csv_row(['error', '', _stream_error(e)])
+
+
+@app.server.route('/api/<key>/best-cluster', methods=['POST'])
+def best_cluster_batch(key):
+    """Classify many parameter vectors at once.
+
+    Accepts a JSON array (lists in `parameters` order or objects keyed by parameter name)
+    or a CSV body with one column per parameter, and streams back the nearest design,
+    its cluster and the normalised distance for every row in the same format.
+
+    JSON batches are checked in full before the response starts. A CSV batch is read while
+    streaming, so a bad row after its first chunk can only be reported in the body: the CSV
+    then ends with a row whose design is 'error' and whose last column holds the message, and
+    a JSON array that fails midway ends with an {"error": message} object.
+    """
+    if key not in DATASETS:
+        return _error(f"Unknown dataset '{key}'.", 404)
+    dataset = get_dataset(key)
+    if len(dataset) == 0:
+        return _error(f"Dataset '{key}' could not be loaded.", 503)
+
+    is_csv = request.mimetype == 'text/csv'
+    try:
+        chunks = _csv_chunks(request.stream) if is_csv else _json_rows(request.get_json(force=True))
+        results = _classify(dataset, chunks)
+        # classify the first chunk eagerly so malformed input still gets a 400
+        first = next(results, None)
+    except INPUT_ERRORS as e:
+        return _error(str(e))
+
+    results = itertools.chain([first] if first is not None else [], results)
+    if is_csv:
+        return Response(stream_with_context(_stream_csv(results)), mimetype='text/csv')
+    return Response(stream_with_context(_stream_json(results)), mimetype='application/json')
+
+
+@app.server.route('/api/memory')
+def dataset_memory():
+    """Bytes held by each dataset this worker has loaded, for sizing worker processes."""
+    return jsonify(memory_report())
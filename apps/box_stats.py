@@ -0,0 +1,80 @@
+import numpy as np
+
+
+def spread(values, cap):
+    """Up to `cap` evenly spread rows of `values`, which is sorted, keeping the first and the last."""
+    if cap is None or len(values) <= cap:
+        return values
+    return values[np.linspace(0, len(values) - 1, cap).round().astype(int)]
+
+
+def summarize(values, outlier_cap=None):
+    """Box-plot statistics of every column of `values`, computed the way plotly does.
+
+    Quartiles interpolate at position p * n - 0.5 like plotly.js' default 'linear' quartilemethod,
+    which is numpy's 'hazen' method. The fences are the most extreme values within 1.5 IQR of the
+    box, but never inside it, and everything beyond them is an outlier. Empty (NaN) values are
+    skipped, as plotly skips them. With `outlier_cap` at most that many outliers are kept per
+    column, evenly spread from the lowest to the highest, so the drawn points stay bounded.
+    """
+    if len(values) == 0:
+        return None
+    q1, median, q3 = np.nanquantile(values, [0.25, 0.5, 0.75], axis=0, method='hazen')
+    iqr = q3 - q1
+    low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    inside = (values >= low) & (values <= high)
+    outside = ~inside & ~np.isnan(values)
+    return {
+        'q1': q1,
+        'median': median,
+        'q3': q3,
+        'lowerfence': np.minimum(q1, np.where(inside, values, np.inf).min(axis=0)),
+        'upperfence': np.maximum(q3, np.where(inside, values, -np.inf).max(axis=0)),
+        'outliers': [spread(np.sort(values[outside[:, column], column]), outlier_cap)
+                     for column in range(values.shape[1])],
+    }
+
+
+class ClusterBoxStats:
+    """Per-cluster box statistics of the normalised parameter matrix, precomputed at load time."""
+
+    def __init__(self, blocks, presorted=False, outlier_cap=None):
+        """`blocks` maps every cluster to the rows of the matrix that belong to it.
+
+        With `presorted` every block is already sorted per column and is kept as it is, so a
+        memory-mapped block stays shared. Every summary, of one cluster or of several, keeps at
+        most `outlier_cap` outliers per column.
+        """
+        self.outlier_cap = outlier_cap
+        # each cluster's values sorted per column: merging selections and sampling need no sort later
+        self._sorted = {cluster: values if presorted else np.sort(values, axis=0) for cluster, values in blocks.items()}
+        self._summaries = {cluster: summarize(values, outlier_cap) for cluster, values in self._sorted.items()}
+
+    def _values(self, selected_clusters):
+        blocks = [self._sorted[cluster] for cluster in selected_clusters if cluster in self._sorted]
+        return np.concatenate(blocks) if blocks else np.empty((0, 0))
+
+    def summary(self, selected_clusters):
+        selected = sorted(set(selected_clusters or []))
+        if len(selected) == 1:
+            return self._summaries.get(selected[0])
+        return summarize(self._values(selected), self.outlier_cap)
+
+    def sample(self, selected_clusters, cap):
+        """Up to `cap` evenly spread values per column, for drawing the raw points."""
+        return spread(np.sort(self._values(sorted(set(selected_clusters or []))), axis=0), cap)
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self._sorted.values()) + sum(
+            outliers.nbytes for summary in self._summaries.values() if summary for outliers in summary['outliers'])
+
+    @property
+    def sorted_blocks(self):
+        """Every cluster's values, sorted per column."""
+        return dict(self._sorted)
+
+    @property
+    def shared_nbytes(self):
+        """Bytes of the sorted blocks that are read-only, i.e. mapped from a file."""
+        return sum(values.nbytes for values in self._sorted.values() if not values.flags.writeable)
@@ -0,0 +1,281 @@
+import contextlib
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+from apps.ingest import read_columns
+
+try:
+    import fcntl
+except ImportError:  # Windows: export_lock only serialises the threads of one process
+    fcntl = None
+
+# Columnar copies of the Excel exports live next to the workbooks
+CACHE_DIR_NAME = '.cache'
+CACHE_FORMAT_VERSION = 4
+
+# Mapped array files start with this magic and the length of their JSON header
+MAPPED_MAGIC = b'DVMAP\x00\x00\x01'
+_MAPPED_PREFIX = struct.Struct('<8sQ')
+# offset alignment of every array in a mapped file
+_MAPPED_ALIGN = 64
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def cache_paths(path, sheet_name):
+    directory, filename = os.path.split(os.path.abspath(path))
+    stem = f"{os.path.splitext(filename)[0]}.{sheet_name}"
+    cache_dir = os.path.join(directory, CACHE_DIR_NAME)
+    return cache_dir, os.path.join(cache_dir, stem + '.parquet'), os.path.join(cache_dir, stem + '.json')
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, write):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _write_meta(meta_path, meta):
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    _write_atomic(meta_path, write)
+
+
+def _read_source(path, sheet_name, columns):
+    if columns is not None:
+        return read_columns(path, columns, sheet_name)
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return pd.read_csv(path), None
+    if extension == '.parquet':
+        return pd.read_parquet(path), None
+    return pd.read_excel(path, sheet_name=sheet_name), None
+
+
+def load_export(path, sheet_name='Sheet1', columns=None):
+    """Read an export (xlsx, CSV or Parquet) through the columnar cache.
+
+    With `columns`, only those columns are read, streaming the source in chunks (see apps.ingest).
+    Returns the dataframe, the SHA-256 of the source, which identifies its content version, and
+    the RunningStats collected while streaming (None when the cache was fresh).
+    """
+    cache_dir, data_path, meta_path = cache_paths(path, sheet_name)
+    signature = source_signature(path)
+    meta = _read_meta(meta_path)
+    wanted = None if columns is None else list(columns)
+
+    if (meta is not None and meta.get('format') == CACHE_FORMAT_VERSION and meta.get('columns') == wanted
+            and os.path.exists(data_path)):
+        if all(meta.get(key) == value for key, value in signature.items()):
+            return pd.read_parquet(data_path), meta['sha256'], None
+
+        # size or mtime moved: only rebuild if the content really changed
+        content_hash = file_hash(path)
+        if meta.get('sha256') == content_hash:
+            _write_meta(meta_path, dict(meta, **signature))
+            return pd.read_parquet(data_path), content_hash, None
+    else:
+        content_hash = file_hash(path)
+
+    df, stats = _read_source(path, sheet_name, wanted)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_atomic(data_path, lambda tmp_path: df.to_parquet(tmp_path, index=False))
+        _write_meta(meta_path, dict(signature, sha256=content_hash, columns=wanted, format=CACHE_FORMAT_VERSION))
+    except (ImportError, OSError) as e:
+        # no parquet engine or read-only checkout: serve the export uncached
+        print(f"Could not write the cache for {path}: {e}")
+    return df, content_hash, stats
+
+
+def _current_meta(path, sheet_name, columns):
+    meta = _read_meta(cache_paths(path, sheet_name)[2])
+    if meta is None or meta.get('format') != CACHE_FORMAT_VERSION or meta.get('columns') != (
+            None if columns is None else list(columns)):
+        return None
+    try:
+        signature = source_signature(path)
+    except OSError:
+        return None
+    return meta if all(meta.get(key) == value for key, value in signature.items()) else None
+
+
+def cached_version(path, sheet_name='Sheet1', columns=None):
+    """Return the version the columnar cache records for `path` if its size and mtime still match, else None.
+
+    That is the SHA-256 of the export, or the version set by record_version once rows were appended
+    to it. Only the cache meta is read, so this is cheap enough to decide whether derived files are current.
+    """
+    meta = _current_meta(path, sheet_name, columns)
+    return None if meta is None else meta.get('appended') or meta.get('sha256')
+
+
+def record_version(path, version, sheet_name='Sheet1', columns=None):
+    """Make `version` the one cached_version reports for `path` until the export itself changes.
+
+    Used for rows appended to the export's data outside of its file; None goes back to the export's
+    own SHA-256. Returns False if the columnar cache is not current, so there is nothing to record in.
+    """
+    meta = _current_meta(path, sheet_name, columns)
+    if meta is None:
+        return False
+    meta.pop('appended', None)
+    if version is not None and version != meta.get('sha256'):
+        meta['appended'] = version
+    _write_meta(cache_paths(path, sheet_name)[2], meta)
+    return True
+
+
+@contextlib.contextmanager
+def export_lock(path):
+    """Hold an exclusive lock on the export at `path`, shared by every process using its cache directory."""
+    cache_dir, lock_path = _array_path(path, 'append', 'lock')
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(lock_path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _array_path(path, name, extension):
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return cache_dir, os.path.join(cache_dir, f"{stem}.{name}.{extension}")
+
+
+def cached_arrays(path, name, version, build):
+    """Return the arrays `build()` derives from the export at `path`, cached next to its columnar copy.
+
+    The cache entry is reused only while it was built from the same content `version`.
+    """
+    cache_dir, array_path = _array_path(path, name, 'npz')
+
+    try:
+        with np.load(array_path) as cached:
+            if str(cached['_version']) == version:
+                return {key: cached[key] for key in cached.files if key != '_version'}
+    except (OSError, KeyError, ValueError):
+        pass
+
+    arrays = build()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, _version=np.array(version), **arrays)
+
+        _write_atomic(array_path, write)
+    except OSError as e:
+        print(f"Could not write the cache for {path}: {e}")
+    return arrays
+
+
+def _aligned(offset):
+    return -(-offset // _MAPPED_ALIGN) * _MAPPED_ALIGN
+
+
+def _write_mapped(f, version, arrays):
+    arrays = {key: np.ascontiguousarray(value) for key, value in arrays.items()}
+    if any(value.dtype.hasobject for value in arrays.values()):
+        raise ValueError("Object arrays can't be memory-mapped.")
+    layout, offset = {}, 0
+    for key, value in arrays.items():
+        layout[key] = {'dtype': value.dtype.str, 'shape': list(value.shape), 'offset': offset}
+        offset = _aligned(offset + value.nbytes)
+    header = json.dumps({'format': CACHE_FORMAT_VERSION, 'version': version, 'arrays': layout}).encode('utf-8')
+    data_start = _aligned(_MAPPED_PREFIX.size + len(header))
+
+    f.write(_MAPPED_PREFIX.pack(MAPPED_MAGIC, len(header)))
+    f.write(header)
+    for key, value in arrays.items():
+        f.seek(data_start + layout[key]['offset'])
+        f.write(value.tobytes())
+    f.truncate(data_start + offset)
+
+
+def _read_mapped(array_path, version):
+    with open(array_path, 'rb') as f:
+        magic, header_size = _MAPPED_PREFIX.unpack(f.read(_MAPPED_PREFIX.size))
+        if magic != MAPPED_MAGIC:
+            return None
+        header = json.loads(f.read(header_size))
+        if header.get('format') != CACHE_FORMAT_VERSION or header.get('version') != version:
+            return None
+        # the mapping stays valid after the file is closed, or replaced by a newer version
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    data_start = _aligned(_MAPPED_PREFIX.size + header_size)
+    arrays = {}
+    for key, spec in header['arrays'].items():
+        dtype, shape = np.dtype(spec['dtype']), tuple(spec['shape'])
+        count = int(np.prod(shape))
+        arrays[key] = np.frombuffer(buffer, dtype, count, data_start + spec['offset']).reshape(shape) if count else \
+            np.empty(shape, dtype)
+    return arrays
+
+
+def mapped_arrays(path, name, version):
+    """Map the arrays last stored by `map_arrays` read-only, or return None if they are missing or stale.
+
+    Every process mapping the same file shares one copy of it in the page cache.
+    """
+    array_path = _array_path(path, name, 'map')[1]
+    try:
+        return _read_mapped(array_path, version)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+
+def map_arrays(path, name, version, arrays):
+    """Store `arrays` derived from content `version` of the export at `path` and return them memory-mapped.
+
+    The arrays are returned unchanged when the file can't be written.
+    """
+    cache_dir, array_path = _array_path(path, name, 'map')
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                _write_mapped(f, version, arrays)
+
+        _write_atomic(array_path, write)
+    except (OSError, ValueError) as e:
+        print(f"Could not write the cache for {path}: {e}")
+        return arrays
+    return mapped_arrays(path, name, version) or arrays
@@ -0,0 +1,234 @@
+import functools
+import os
+
+import dash
+from dash import dcc, html, ALL, MATCH, Patch
+from app import app, background_callback_manager
+from apps.datasets import get_dataset, mesh_build_status, parameters, start_mesh_build
+from apps.figure_cache import cached_figure
+from apps.figures import box_figure, user_markers
+
+# Exports with at least this many rows build their mesh and run lookups in the background,
+# smaller ones within the request
+BACKGROUND_ROWS = int(os.environ.get('BACKGROUND_CALLBACK_ROWS', 200000))
+# Milliseconds between the checks of a page for its mesh while this process builds it
+MESH_POLL_INTERVAL = 500
+
+
+# Every component id carries the dataset key, so one set of callbacks serves all pages
+def component_id(kind, key, **extra):
+    return dict(type=kind, dataset=key, **extra)
+
+
+def _output_dataset():
+    outputs = dash.callback_context.outputs_list
+    if isinstance(outputs, list):
+        outputs = outputs[0]
+    return get_dataset(outputs['id']['dataset'])
+
+
+def _no_progress(*_):
+    pass
+
+
+def heavy_callback(*dependencies, progress=None, cancel=None, running=None, **kwargs):
+    """Register a callback that may run too long for a request thread.
+
+    With a background callback manager it runs in the manager's process pool, reports through
+    `progress` and is cancelled by `cancel`; without one it runs inline and ignores its progress.
+    The decorated function always receives `set_progress` as its first argument.
+    """
+    def decorator(func):
+        if background_callback_manager is not None:
+            return app.callback(*dependencies, background=True, progress=progress, cancel=cancel,
+                                running=running, **kwargs)(func)
+        return app.callback(*dependencies, running=running, **kwargs)(functools.partial(func, _no_progress))
+    return decorator
+
+
+def _in_background(dataset):
+    return background_callback_manager is not None and len(dataset) >= BACKGROUND_ROWS
+
+
+def layout(spec):
+    dataset = get_dataset(spec.key)
+    clusters = dataset.clusters
+    background = _in_background(dataset)
+    if background:
+        # built on a thread of this process, so every later page of the dataset embeds it
+        start_mesh_build(dataset)
+    else:
+        dataset.mesh_figure
+
+    return html.Div([
+        html.Div([
+            dcc.Link('Back to homepage', href='/homepage', style={'fontSize': 18, 'textAlign': 'center', 'family': 'Arial, '
+                                                                                                                   'sans'
+                                                                                                                   '-serif'}),
+            # add back link
+            html.Br(),  # add the change line
+        ]),
+        # built once per dataset and never re-sent: camera moves stay in the browser.
+        # Until this process has built it, the page polls for it and shows the build's progress.
+        *([] if dataset.mesh_is_built else [dcc.Interval(id=component_id('mesh-poll', spec.key),
+                                                         interval=MESH_POLL_INTERVAL)]),
+        html.Div(id=component_id('mesh-progress', spec.key), style={'textAlign': 'center'}),
+        dcc.Store(id='selection-changed'),
+        dcc.Graph(id=component_id('3d-mesh-plot', spec.key),
+                  figure=dataset.mesh_figure if dataset.mesh_is_built else {},
+                  style={'display': 'flex',
+                         'justifyContent': 'center',
+                         'alignItems': 'center',
+                         'height': '60vh'}),
+        dcc.Store(id=component_id('bar-store', spec.key), data=dataset.bar_store),
+        dcc.Graph(id=component_id('bar-chart', spec.key)),
+        dcc.Dropdown(
+            id=component_id('cluster-dropdown', spec.key),
+            options=[{'label': f"Cluster {cluster}", 'value': cluster} for cluster in clusters],
+            value=[clusters[0]],
+            multi=True,
+            clearable=False,
+            style={'marginBottom': '24px'}
+        ),
+        html.Div(dcc.Graph(id=component_id('box-plot', spec.key)), style={'marginBottom': '60px'}),
+        dcc.Store(id=component_id('user-input-store', spec.key)),
+
+        html.Div(children='Input your value', style={'height': '50px', 'fontSize': '24px', 'textAlign': 'center'}),
+        html.Div([
+            html.Div([
+                html.Div(
+                    [
+                        html.Label(param, style={'fontSize': '20px', 'marginRight': '15px'}),
+                    ], style={'width': '300px', 'display': 'inline-block', 'textAlign': 'right'}),
+                dcc.Input(id=component_id('input', spec.key, index=index), type='number', step='any',
+                          value=0 if len(dataset) else 0,
+                          style={'fontSize': '16px', 'width': '100px', 'display': 'inline-block'})
+            ], style={'display': 'flex', 'alignItems': 'center', 'marginBottom': '15px'})
+            for index, param in enumerate(parameters)
+        ], style={'textAlign': 'center', 'marginBottom': '20px'}),
+
+        html.Button('Find Best Cluster',
+                    id=component_id('background-submit-button' if background else 'submit-button', spec.key),
+                    style={'fontSize': '20px', 'lineHeight': '1.25'}),
+        html.Div(id='best-cluster-progress', style={'fontSize': '16px', 'textAlign': 'center'}),
+        html.Div(id=component_id('best-cluster-output', spec.key), style={'fontSize': '20px', 'textAlign': 'center'})
+
+    ])
+
+
+# highlighting is done in the browser, see assets/clientside.js
+app.clientside_callback(
+    dash.dependencies.ClientsideFunction(namespace='clusters', function_name='highlightBars'),
+    dash.dependencies.Output(component_id('bar-chart', MATCH), 'figure'),
+    [dash.dependencies.Input(component_id('cluster-dropdown', MATCH), 'value')],
+    [dash.dependencies.State(component_id('bar-store', MATCH), 'data')]
+)
+
+
+# mirror the dropdown into a plain id, which background callbacks accept as a cancel input
+app.clientside_callback(
+    "function (selections) { return Date.now(); }",
+    dash.dependencies.Output('selection-changed', 'data'),
+    [dash.dependencies.Input(component_id('cluster-dropdown', ALL), 'value')],
+    prevent_initial_call=True
+)
+
+
+# The page's server work is split into three stages that don't recompute each other:
+# the box plot follows the dropdown, the lookup follows the button, and the lookup
+# result only patches the marker trace of the box plot.
+@cached_figure('box-plot')
+def _box_figure(dataset, selection=None, inputs=None):
+    points = dataset.box_stats.sample(selection, dataset.spec.box_points_cap) if dataset.spec.box_points else None
+    return box_figure(parameters, dataset.box_stats.summary(selection), points)
+
+
+@cached_figure('best-cluster')
+def _best_cluster(dataset, selection=None, inputs=None):
+    return dataset.find_best_cluster(inputs)[1]
+
+
+@app.callback(
+    dash.dependencies.Output(component_id('box-plot', MATCH), 'figure'),
+    [dash.dependencies.Input(component_id('cluster-dropdown', MATCH), 'value')],
+    [dash.dependencies.State(component_id('user-input-store', MATCH), 'data')]
+)
+def update_box_plot(selected_clusters, user_input):
+    dataset = _output_dataset()
+    figure = _box_figure(dataset, selection=selected_clusters or [])
+    if user_input:
+        figure = dict(figure, data=[user_markers(parameters, user_input)] + figure['data'][1:])
+    return figure
+
+
+def find_best_cluster(set_progress, n_clicks, values):
+    if not n_clicks:
+        return dash.no_update, dash.no_update
+
+    set_progress('Loading the dataset ...')
+    dataset = _output_dataset()
+    if any(value is None for value in values) or len(dataset) == 0:
+        set_progress('')
+        return "Please ensure all fields are filled before clicking 'Find Best Cluster'.", dash.no_update
+
+    set_progress('Searching for the most suitable cluster ...')
+    best_cluster = _best_cluster(dataset, inputs=values)
+    set_progress('')
+    return (f'The most suitable cluster for the given parameters is: Cluster {best_cluster}',
+            dataset.normalize_inputs(values).tolist())
+
+
+# The lookup itself is a KD-tree query and runs within the request; the page of a large
+# export, which a restarted worker may have to load first, uses the background variant.
+app.callback(
+    [dash.dependencies.Output(component_id('best-cluster-output', MATCH), 'children'),
+     dash.dependencies.Output(component_id('user-input-store', MATCH), 'data')],
+    [dash.dependencies.Input(component_id('submit-button', MATCH), 'n_clicks')],
+    [dash.dependencies.State(component_id('input', MATCH, index=ALL), 'value')],
+    prevent_initial_call=True
+)(functools.partial(find_best_cluster, _no_progress))
+
+heavy_callback(
+    [dash.dependencies.Output(component_id('best-cluster-output', MATCH), 'children', allow_duplicate=True),
+     dash.dependencies.Output(component_id('user-input-store', MATCH), 'data', allow_duplicate=True)],
+    [dash.dependencies.Input(component_id('background-submit-button', MATCH), 'n_clicks')],
+    [dash.dependencies.State(component_id('input', MATCH, index=ALL), 'value')],
+    progress=dash.dependencies.Output('best-cluster-progress', 'children'),
+    # a new selection makes a running lookup pointless
+    cancel=[dash.dependencies.Input('selection-changed', 'data')],
+    running=[(dash.dependencies.Output(component_id('background-submit-button', MATCH), 'disabled'), True, False)],
+    prevent_initial_call=True
+)(find_best_cluster)
+
+
+@cached_figure('3d-mesh-plot')
+def _mesh_figure(dataset, selection=None, inputs=None):
+    return dataset.mesh_figure
+
+
+@app.callback(
+    [dash.dependencies.Output(component_id('3d-mesh-plot', MATCH), 'figure'),
+     dash.dependencies.Output(component_id('mesh-poll', MATCH), 'disabled'),
+     dash.dependencies.Output(component_id('mesh-progress', MATCH), 'children')],
+    [dash.dependencies.Input(component_id('mesh-poll', MATCH), 'n_intervals')]
+)
+def poll_mesh_plot(n_intervals):
+    dataset = _output_dataset()
+    if dataset.mesh_is_built:
+        return _mesh_figure(dataset), True, ''
+    # another worker may answer the poll, or the dataset may have been swapped since the page was served
+    start_mesh_build(dataset)
+    message, failed = mesh_build_status(dataset)
+    return dash.no_update, failed, message
+
+
+@app.callback(
+    dash.dependencies.Output(component_id('box-plot', MATCH), 'figure', allow_duplicate=True),
+    [dash.dependencies.Input(component_id('user-input-store', MATCH), 'data')],
+    prevent_initial_call=True
+)
+def update_user_markers(user_input):
+    # Add red dots to denote the normalized values of user input, without resending the boxes
+    patched = Patch()
+    patched['data'][0] = user_markers(parameters, user_input)
+    return patched
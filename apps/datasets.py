@@ -0,0 +1,658 @@
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from apps.box_stats import ClusterBoxStats
+from apps.data_loader import (
+    cached_arrays, cached_version, export_lock, load_export, map_arrays, mapped_arrays, record_version,
+    source_signature,
+)
+from apps.figures import bar_store, mesh_figure
+from apps.mesh import detail_levels, select_level, triangulate
+from apps.nearest import NearestDesignIndex
+
+# For Bar Chart
+indicators = ['UTCI', 'GWP', 'LCC']
+
+# For Box Plot
+parameters = [
+    "Baumanteil [%]", "PV-Dach [%]", "PV battery capacity", "PV-facade-% south",
+    "Fensterflächenanteil", "Fenster g-Wert", "Gründachstärke",
+    "Kronendurchmesser", "Baumhöhe", "Kronentransparenz Sommer",
+    "Kronentransparenz Winter", "Albedo Fassade", "Straßenbreite", "PV Ost-West Fassade [%]"
+]
+
+# Every column the pages read from an export
+VALUE_COLUMNS = parameters + indicators
+COLUMNS = VALUE_COLUMNS + ['cluster']
+
+# Name of the file, next to the columnar cache, that every worker maps a dataset's arrays from
+DATASET_ARRAYS = 'dataset'
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    """Describes one page: which workbook it shows and under which id."""
+    key: str
+    title: str
+    path: str
+    # how the server triangulates the 3D mesh, see apps.mesh.TRIANGULATIONS
+    mesh_triangulation: str = 'delaunay'
+    mesh_alpha: float = 2.0
+    # most vertices the 3D mesh may send; larger exports are served decimated
+    mesh_vertex_budget: int = 50000
+    # draw a sample of at most box_points_cap raw values next to every box; without it every
+    # box draws its outliers, also at most box_points_cap of them
+    box_points: bool = False
+    box_points_cap: int = 500
+
+
+DATASETS = {
+    spec.key: spec for spec in [
+        DatasetSpec('house', 'House', 'dash_visu_export.xlsx'),
+        DatasetSpec('city', 'City', 'dash_visu_export_city.xlsx'),
+        DatasetSpec('room', 'Room', 'dash_visu_export_room.xlsx'),
+    ]
+}
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """One export workbook together with the statistics the pages derive from it.
+
+    Rows are held as compact arrays: float32 parameter and indicator matrices and a small
+    integer code per row into the sorted cluster labels. Dataframes such as `df` or `avg_df`
+    are built from them when asked for. Instances are shared by every request for the dataset
+    and must not be modified.
+    """
+    spec: DatasetSpec
+    # content hash of the source workbook, None if it could not be read
+    version: str
+    # row labels of the export, reported as the design of a lookup
+    index: pd.Index
+    # raw values, one row per design, columns in `parameters` / `indicators` order
+    parameter_values: np.ndarray
+    indicator_values: np.ndarray
+    # sorted cluster labels; cluster_codes holds each row's position in them
+    cluster_ids: np.ndarray
+    cluster_codes: np.ndarray
+    # cluster_order[cluster_offsets[c]:cluster_offsets[c + 1]] are the rows of cluster_ids[c]
+    cluster_order: np.ndarray
+    cluster_offsets: np.ndarray
+    # rows per cluster, and per cluster and column the number of non-empty values and their
+    # float64 sum, columns in VALUE_COLUMNS order
+    cluster_counts: np.ndarray
+    cluster_value_counts: np.ndarray
+    cluster_sums: np.ndarray
+    # float64 column minima and maxima in VALUE_COLUMNS order
+    minimum: np.ndarray
+    maximum: np.ndarray
+    # holds the normalised parameter matrix in float64, see df_normalized
+    nearest_index: NearestDesignIndex
+    # holds a float32 copy of it, sorted per column within each cluster, for plotting
+    box_stats: ClusterBoxStats
+
+    def __len__(self):
+        return len(self.index)
+
+    def _series(self, values, columns):
+        return pd.Series(values[[VALUE_COLUMNS.index(column) for column in columns]], index=columns)
+
+    @property
+    def min_values(self):
+        return self._series(self.minimum, indicators)
+
+    @property
+    def max_values(self):
+        return self._series(self.maximum, indicators)
+
+    @property
+    def min_vals(self):
+        return self._series(self.minimum, parameters)
+
+    @property
+    def max_vals(self):
+        return self._series(self.maximum, parameters)
+
+    @property
+    def clusters(self):
+        return self.cluster_ids.tolist()
+
+    @property
+    def df(self):
+        """The export's columns as a dataframe, rebuilt on every access."""
+        data = {column: self.parameter_values[:, position] for position, column in enumerate(parameters)}
+        data.update({column: self.indicator_values[:, position] for position, column in enumerate(indicators)})
+        data['cluster'] = self.cluster_ids[self.cluster_codes]
+        return pd.DataFrame(data, index=self.index)
+
+    @property
+    def df_normalized(self):
+        return pd.DataFrame(self.nearest_index.matrix, index=self.index, columns=parameters, copy=False)
+
+    @property
+    def avg_df(self):
+        """Same as `df.groupby('cluster').mean()`: empty values are skipped, and a column without any is NaN."""
+        counts = self.cluster_value_counts
+        means = np.divide(self.cluster_sums, counts, out=np.full(counts.shape, np.nan), where=counts > 0)
+        return pd.DataFrame(means, columns=VALUE_COLUMNS, index=pd.Index(self.cluster_ids, name='cluster'))
+
+    @property
+    def normalized_avg_df(self):
+        return (self.avg_df[indicators] - self.min_values) / (self.max_values - self.min_values)
+
+    def cluster_rows(self, position):
+        """Row positions of the cluster at `position` in cluster_ids."""
+        return self.cluster_order[self.cluster_offsets[position]:self.cluster_offsets[position + 1]]
+
+    def memory_usage(self):
+        """Bytes held by each part of the dataset and their 'total', for sizing worker processes.
+
+        'shared' is the part of the total mapped from the dataset's array file, which all
+        workers share.
+        """
+        arrays = [getattr(self, name) for name in _ARRAY_FIELDS]
+        usage = {name: array.nbytes for name, array in zip(_ARRAY_FIELDS, arrays)}
+        usage['index'] = self.index.memory_usage()
+        usage['nearest_index'] = self.nearest_index.nbytes
+        usage['box_stats'] = self.box_stats.nbytes
+        if 'mesh_levels' in self.__dict__:
+            usage['mesh_levels'] = sum(rows.nbytes for rows in self.mesh_levels)
+        usage['total'] = sum(usage.values())
+        usage['shared'] = self.box_stats.shared_nbytes + sum(
+            array.nbytes for array in arrays + [self.nearest_index.matrix] if not array.flags.writeable)
+        return usage
+
+    def normalize_inputs(self, values):
+        """Scale raw parameter values the same way as `df_normalized`."""
+        values = np.asarray(values, dtype=np.float64)
+        span = (self.max_vals - self.min_vals).to_numpy()
+        # a parameter with zero range normalises to 0 for every design, so inputs do too
+        normalized = (values - self.min_vals.to_numpy()) / np.where(span > 0, span, 1)
+        return np.where(span > 0, normalized, 0.0)
+
+    def find_best_cluster(self, values):
+        """Return (row label, cluster, distance) of the design nearest to the raw input values."""
+        distances, rows, clusters = self.nearest_index.query(self.normalize_inputs(values))
+        return self.index[rows[0]], clusters[0], distances[0]
+
+    def _cached_arrays(self, name, build):
+        if self.version is None:
+            return build()
+        return cached_arrays(self.spec.path, name, self.version, build)
+
+    @cached_property
+    def mesh_levels(self):
+        """Row positions of every level of detail of the UTCI/GWP/LCC cloud, finest first."""
+        points = self.indicator_values.astype(np.float64)
+        if len(points) == 0:
+            return [np.arange(0)]
+
+        def build():
+            return {f'level{level}': rows for level, rows in enumerate(detail_levels(points)) if level > 0}
+
+        arrays = self._cached_arrays('mesh-lod', build)
+        return [np.arange(len(points))] + [arrays[f'level{level}'] for level in range(1, len(arrays) + 1)]
+
+    @cached_property
+    def mesh_level(self):
+        return select_level(self.mesh_levels, self.spec.mesh_vertex_budget)
+
+    @cached_property
+    def mesh_triangles(self):
+        if len(self) == 0:
+            return None
+        method, alpha = self.spec.mesh_triangulation, self.spec.mesh_alpha
+        points = self.indicator_values[self.mesh_levels[self.mesh_level]].astype(np.float64)
+
+        def build():
+            triangles = triangulate(points, method, alpha)
+            return {} if triangles is None else {'triangles': triangles}
+
+        name = f'mesh-{method}' + (f'-{alpha:g}' if method == 'alpha' else '') + f'-lod{self.mesh_level}'
+        return self._cached_arrays(name, build).get('triangles')
+
+    @cached_property
+    def bar_store(self):
+        return bar_store(self.normalized_avg_df)
+
+    @property
+    def mesh_is_built(self):
+        return 'mesh_figure' in self.__dict__
+
+    @cached_property
+    def mesh_figure(self):
+        rows = self.mesh_levels[self.mesh_level]
+        return mesh_figure(pd.DataFrame(self.indicator_values[rows], columns=indicators), self.mesh_triangles)
+
+
+# Dataset fields stored as plain arrays, in the dataset's array file as well
+_ARRAY_FIELDS = ['parameter_values', 'indicator_values', 'cluster_ids', 'cluster_codes', 'cluster_order',
+                 'cluster_offsets', 'cluster_counts', 'cluster_value_counts', 'cluster_sums', 'minimum', 'maximum']
+
+
+def _smallest_uint(largest):
+    return np.min_scalar_type(max(int(largest), 0))
+
+
+def derive_arrays(df, stats=None):
+    """Compute every array a Dataset is assembled from; `stats` are aggregates already collected while streaming df in.
+
+    Besides the _ARRAY_FIELDS this holds 'normalized', the float64 normalised parameter matrix,
+    'box_values', its rows grouped by cluster and sorted per column within each cluster as float32, and
+    'index' when the row labels are not simply 0..n-1. Rows without a cluster are left out.
+    """
+    if df['cluster'].isna().any():
+        df = df[df['cluster'].notna()]
+    values = df[VALUE_COLUMNS].to_numpy(dtype=np.float64)
+    if stats is not None:
+        cluster_ids, cluster_counts, cluster_value_counts, cluster_sums = stats.cluster_totals()
+        minimum = stats.min_series()[VALUE_COLUMNS].to_numpy()
+        maximum = stats.max_series()[VALUE_COLUMNS].to_numpy()
+    else:
+        grouped = df.groupby('cluster')[VALUE_COLUMNS]
+        sums = grouped.sum()
+        cluster_ids = sums.index.to_numpy().astype(np.int64)
+        cluster_counts = grouped.size().to_numpy(dtype=np.int64)
+        cluster_value_counts = grouped.count().to_numpy(dtype=np.int64)
+        cluster_sums = sums.to_numpy(dtype=np.float64)
+        minimum = df[VALUE_COLUMNS].min().to_numpy(dtype=np.float64)
+        maximum = df[VALUE_COLUMNS].max().to_numpy(dtype=np.float64)
+
+    cluster_codes = np.searchsorted(cluster_ids, df['cluster'].to_numpy()).astype(_smallest_uint(len(cluster_ids) - 1))
+    cluster_order = np.argsort(cluster_codes, kind='stable').astype(_smallest_uint(len(df) - 1))
+    cluster_offsets = np.concatenate([[0], np.cumsum(cluster_counts)])
+
+    # normalised in float64 from the source values, before they are stored as float32
+    count = len(parameters)
+    min_vals, max_vals = minimum[:count], maximum[:count]
+    span = np.where(max_vals > min_vals, max_vals - min_vals, 1)
+    normalized = (values[:, :count] - min_vals) / span
+    # only plotted, so float32 is plenty; rounding keeps every column sorted
+    blocks = [np.sort(normalized[rows], axis=0).astype(np.float32)
+              for rows in np.split(cluster_order, cluster_offsets[1:-1])]
+
+    arrays = {
+        'parameter_values': values[:, :count].astype(np.float32),
+        'indicator_values': values[:, count:].astype(np.float32),
+        'cluster_ids': cluster_ids,
+        'cluster_codes': cluster_codes,
+        'cluster_order': cluster_order,
+        'cluster_offsets': cluster_offsets,
+        'cluster_counts': cluster_counts,
+        'cluster_value_counts': cluster_value_counts,
+        'cluster_sums': cluster_sums,
+        'minimum': minimum,
+        'maximum': maximum,
+        'normalized': normalized,
+        'box_values': np.concatenate(blocks) if blocks else np.empty((0, count), dtype=np.float32),
+    }
+    if not df.index.equals(pd.RangeIndex(len(df))):
+        arrays['index'] = df.index.to_numpy()
+    return arrays
+
+
+def assemble_dataset(spec, version, arrays):
+    """Build a Dataset around `arrays` from derive_arrays without copying them; they may be memory-mapped."""
+    cluster_ids, cluster_offsets = arrays['cluster_ids'], arrays['cluster_offsets']
+    blocks = np.split(arrays['box_values'], cluster_offsets[1:-1])
+    return Dataset(
+        spec=spec,
+        version=version,
+        index=pd.Index(arrays['index']) if 'index' in arrays else pd.RangeIndex(len(arrays['cluster_codes'])),
+        **{name: arrays[name] for name in _ARRAY_FIELDS},
+        nearest_index=NearestDesignIndex(arrays['normalized'], arrays['cluster_codes'], labels=cluster_ids),
+        box_stats=ClusterBoxStats(dict(zip(cluster_ids.tolist(), blocks)), presorted=True,
+                                  outlier_cap=spec.box_points_cap),
+    )
+
+
+def build_dataset(spec, df, version=None, stats=None):
+    """Derive a Dataset from its dataframe; `stats` are aggregates already collected while streaming it in."""
+    return assemble_dataset(spec, version, derive_arrays(df, stats))
+
+
+def _appended_version(dataset, values, labels):
+    digest = hashlib.sha256((dataset.version or '').encode('utf-8'))
+    digest.update(values.tobytes())
+    digest.update(labels.tobytes())
+    return digest.hexdigest()
+
+
+def _merge_sorted(block, added):
+    """Merge the rows `added` into `block`, which is sorted per column, keeping every column sorted."""
+    added = np.sort(added, axis=0)
+    merged = np.empty((len(block) + len(added), block.shape[1]), dtype=block.dtype)
+    for column in range(block.shape[1]):
+        # where each added value lands in the merged column: its place in the block plus its rank
+        inserted = np.zeros(len(merged), dtype=bool)
+        inserted[np.searchsorted(block[:, column], added[:, column]) + np.arange(len(added))] = True
+        merged[inserted, column] = added[:, column]
+        merged[~inserted, column] = block[:, column]
+    return merged
+
+
+def extend_dataset(dataset, rows):
+    """Return a new Dataset holding the rows of `dataset` followed by `rows`, a dataframe with COLUMNS.
+
+    Cluster counts and sums, and with them the means, as well as the column minima and maxima are
+    updated from the new rows alone. The normalised matrix and box values of the existing rows are
+    kept as they are unless a parameter's minimum or maximum moved, in which case they are
+    rescaled; the new rows are normalised on their own. Only the KD-tree is rebuilt from scratch.
+    Appended rows are labelled by position when the existing rows are; rows without a cluster are left out.
+    """
+    extended = _extended_arrays(dataset, rows)
+    return dataset if extended is None else assemble_dataset(dataset.spec, *extended)
+
+
+def _extended_arrays(dataset, rows):
+    rows = rows[rows['cluster'].notna()]
+    if len(rows) == 0:
+        return None
+    values = rows[VALUE_COLUMNS].to_numpy(dtype=np.float64)
+    labels = rows['cluster'].to_numpy().astype(np.int64)
+
+    # clusters seen for the first time shift the codes of the ones sorted after them
+    cluster_ids = np.union1d(dataset.cluster_ids, labels)
+    remap = np.searchsorted(cluster_ids, dataset.cluster_ids)
+    new_codes = np.searchsorted(cluster_ids, labels)
+    cluster_codes = np.concatenate([remap[dataset.cluster_codes], new_codes]).astype(
+        _smallest_uint(len(cluster_ids) - 1))
+
+    cluster_counts = np.zeros(len(cluster_ids), dtype=np.int64)
+    cluster_counts[remap] = dataset.cluster_counts
+    cluster_counts += np.bincount(new_codes, minlength=len(cluster_ids))
+    present = ~np.isnan(values)
+    cluster_value_counts = np.zeros((len(cluster_ids), len(VALUE_COLUMNS)), dtype=np.int64)
+    cluster_value_counts[remap] = dataset.cluster_value_counts
+    np.add.at(cluster_value_counts, new_codes, present)
+    cluster_sums = np.zeros((len(cluster_ids), len(VALUE_COLUMNS)))
+    cluster_sums[remap] = dataset.cluster_sums
+    np.add.at(cluster_sums, new_codes, np.where(present, values, 0.0))
+    minimum = np.fmin(dataset.minimum, np.nanmin(values, axis=0))
+    maximum = np.fmax(dataset.maximum, np.nanmax(values, axis=0))
+
+    count = len(parameters)
+    min_vals, max_vals = minimum[:count], maximum[:count]
+    old_min, old_max = dataset.minimum[:count], dataset.maximum[:count]
+    span = np.where(max_vals > min_vals, max_vals - min_vals, 1)
+    if np.array_equal(old_min, min_vals) and np.array_equal(old_max, max_vals):
+        def rescale(matrix):
+            return matrix
+    else:
+        # (x - old_min) / old_span is mapped onto (x - min) / span; the order within a column is kept
+        old_span = np.where(old_max > old_min, old_max - old_min, 1)
+        scale, shift = old_span / span, (old_min - min_vals) / span
+
+        def rescale(matrix):
+            return matrix * scale + shift
+    normalized_rows = (values[:, :count] - min_vals) / span
+
+    old_blocks = dataset.box_stats.sorted_blocks
+    blocks = []
+    for position, cluster in enumerate(cluster_ids.tolist()):
+        block = old_blocks.get(cluster, np.empty((0, count), dtype=np.float32))
+        block = rescale(block).astype(np.float32, copy=False)
+        added = normalized_rows[new_codes == position].astype(np.float32)
+        blocks.append(_merge_sorted(block, added) if len(added) else block)
+
+    arrays = {
+        'parameter_values': np.concatenate([dataset.parameter_values, values[:, :count].astype(np.float32)]),
+        'indicator_values': np.concatenate([dataset.indicator_values, values[:, count:].astype(np.float32)]),
+        'cluster_ids': cluster_ids,
+        'cluster_codes': cluster_codes,
+        'cluster_order': np.argsort(cluster_codes, kind='stable').astype(_smallest_uint(len(cluster_codes) - 1)),
+        'cluster_offsets': np.concatenate([[0], np.cumsum(cluster_counts)]),
+        'cluster_counts': cluster_counts,
+        'cluster_value_counts': cluster_value_counts,
+        'cluster_sums': cluster_sums,
+        'minimum': minimum,
+        'maximum': maximum,
+        'normalized': np.concatenate([rescale(dataset.nearest_index.matrix), normalized_rows]),
+        'box_values': np.concatenate(blocks) if blocks else np.empty((0, count), dtype=np.float32),
+    }
+    if not dataset.index.equals(pd.RangeIndex(len(dataset))):
+        arrays['index'] = np.concatenate([dataset.index.to_numpy(), rows.index.to_numpy()])
+    return _appended_version(dataset, values, labels), arrays
+
+
+def _read_export(spec):
+    # only the columns the pages use are read, streamed chunk by chunk
+    return load_export(spec.path, sheet_name='Sheet1', columns=COLUMNS)
+
+
+def _load_arrays(spec):
+    """Return (version, arrays) of the export, mapped from the dataset's array file where possible.
+
+    A worker started after any other process last read the export, or appended rows to it, maps
+    the arrays written then and parses nothing; otherwise the export is read and the file written
+    for the others.
+    """
+    version = cached_version(spec.path, 'Sheet1', COLUMNS)
+    arrays = None if version is None else mapped_arrays(spec.path, DATASET_ARRAYS, version)
+    if arrays is None:
+        df, version, stats = _read_export(spec)
+        recorded = cached_version(spec.path, 'Sheet1', COLUMNS)
+        if recorded not in (None, version):
+            # the export was only touched: keep the rows appended to it, see append_rows
+            arrays = mapped_arrays(spec.path, DATASET_ARRAYS, recorded)
+            if arrays is not None:
+                return recorded, arrays
+            print(f"Rows appended to {spec.path} are lost, serving the export alone")
+            record_version(spec.path, None, 'Sheet1', COLUMNS)
+        arrays = map_arrays(spec.path, DATASET_ARRAYS, version, derive_arrays(df, stats))
+    return version, arrays
+
+
+def load_dataset(spec):
+    try:
+        version, arrays = _load_arrays(spec)
+    except Exception as e:
+        print(f"Error reading the Excel file: {e}")
+        version, arrays = None, derive_arrays(pd.DataFrame(columns=COLUMNS, dtype=np.float64))
+    dataset = assemble_dataset(spec, version, arrays)
+    print(f"Loaded dataset '{spec.key}': {len(dataset)} rows, {dataset.memory_usage()['total'] / 2 ** 20:.1f} MiB")
+    return dataset
+
+
+def _signature(spec):
+    try:
+        return source_signature(spec.path)
+    except OSError:
+        return None
+
+
+_datasets = {}
+_signatures = {}
+_locks = {name: threading.Lock() for name in DATASETS}
+
+
+def register_dataset(spec):
+    """Serve another export, e.g. a synthetic one, under `spec.key` next to the built-in DATASETS."""
+    DATASETS[spec.key] = spec
+    _locks.setdefault(spec.key, threading.Lock())
+
+
+def unload_dataset(name):
+    """Forget the loaded dataset `name`; the next get_dataset loads it again."""
+    with _locks[name]:
+        _datasets.pop(name, None)
+        _signatures.pop(name, None)
+
+
+def get_dataset(name):
+    """Return the dataset `name`, loading it on first use.
+
+    Callers should fetch the dataset once per request and use that object throughout: a reload
+    replaces the registry entry with a new Dataset but never changes an existing one.
+    """
+    dataset = _datasets.get(name)
+    if dataset is None:
+        with _locks[name]:
+            # another request may have finished loading while we waited
+            dataset = _datasets.get(name)
+            if dataset is None:
+                _signatures[name] = _signature(DATASETS[name])
+                dataset = load_dataset(DATASETS[name])
+                _datasets[name] = dataset
+        watch_datasets()
+    return dataset
+
+
+def memory_report():
+    """Memory usage of every dataset this process has loaded, see Dataset.memory_usage."""
+    return {name: dataset.memory_usage() for name, dataset in list(_datasets.items())}
+
+
+def reload_dataset(name):
+    """Re-ingest the workbook of a loaded dataset if it or the rows appended to it changed.
+
+    Returns True if a new version was swapped in.
+    """
+    spec, current = DATASETS[name], _datasets.get(name)
+    signature = _signature(spec)
+    if current is None or signature is None:
+        return False
+    if signature == _signatures.get(name) and cached_version(spec.path, 'Sheet1', COLUMNS) in (
+            None, current.version):
+        return False
+    try:
+        version, arrays = _load_arrays(spec)
+    except Exception as e:
+        # keep serving the old version; a half-written workbook is retried on the next check
+        print(f"Error reloading the Excel file {spec.path}: {e}")
+        return False
+    _signatures[name] = signature
+    if version == current.version:
+        return False
+
+    # build every derived structure before the swap, so no request ever sees a partial dataset
+    dataset = assemble_dataset(spec, version, arrays)
+    dataset.bar_store
+    dataset.mesh_figure
+    with _locks[name]:
+        _datasets[name] = dataset
+    print(f"Reloaded dataset '{name}' from {spec.path}")
+    return True
+
+
+def build_mesh(dataset, report=None):
+    """Build the mesh figure of `dataset`, telling `report` about every step."""
+    report = report or (lambda message: None)
+    report('Decimating the solution space ...')
+    dataset.mesh_levels
+    report('Triangulating the solution space ...')
+    dataset.mesh_triangles
+    return dataset.mesh_figure
+
+
+# Mesh builds running on threads of this process: dataset key -> (dataset, progress message, failed)
+_mesh_builds = {}
+_mesh_builds_lock = threading.Lock()
+
+
+def _report_mesh_build(dataset, message, failed=False):
+    with _mesh_builds_lock:
+        if _mesh_builds.get(dataset.spec.key, (None,))[0] is dataset:
+            _mesh_builds[dataset.spec.key] = (dataset, message, failed)
+
+
+def _build_mesh_thread(dataset):
+    try:
+        build_mesh(dataset, lambda message: _report_mesh_build(dataset, message))
+        _report_mesh_build(dataset, '')
+    except Exception as e:
+        print(f"Error building the 3D mesh of '{dataset.spec.key}': {e}")
+        _report_mesh_build(dataset, f"The 3D mesh could not be built: {e}", failed=True)
+
+
+def start_mesh_build(dataset):
+    """Build the mesh figure of `dataset` on a thread of this process, unless it is built or being built.
+
+    The figure stays on the dataset in this process, so every later page of it embeds the
+    mesh; see mesh_build_status for the progress of the build.
+    """
+    if dataset.mesh_is_built:
+        return
+    with _mesh_builds_lock:
+        if _mesh_builds.get(dataset.spec.key, (None,))[0] is dataset:
+            return
+        _mesh_builds[dataset.spec.key] = (dataset, '', False)
+    threading.Thread(target=_build_mesh_thread, args=(dataset,), name=f'mesh-{dataset.spec.key}',
+                     daemon=True).start()
+
+
+def mesh_build_status(dataset):
+    """Return (progress message, failed) of the mesh build started for `dataset` in this process."""
+    with _mesh_builds_lock:
+        build = _mesh_builds.get(dataset.spec.key)
+    if build is None or build[0] is not dataset:
+        return '', False
+    return build[1], build[2]
+
+
+def append_rows(name, rows):
+    """Append a batch of new variants to the dataset `name`, swap the result in and share it with other workers.
+
+    See extend_dataset. The appended dataset gets a version of its own, so cached figures of the
+    previous one are not served for it. Its arrays are written to the dataset's array file and its
+    version recorded in the columnar cache, so the other workers swap it in at their next reload
+    check (see watch_datasets) and workers started later load it. Batches appended by different
+    processes are serialised by export_lock. A later change of the workbook replaces it as usual.
+    """
+    spec = DATASETS[name]
+    get_dataset(name)
+    # under both locks, so concurrent batches are all kept
+    with _locks[name], export_lock(spec.path):
+        dataset = _datasets[name]
+        recorded = cached_version(spec.path, 'Sheet1', COLUMNS)
+        if recorded not in (None, dataset.version):
+            # another worker appended since this one loaded
+            arrays = mapped_arrays(spec.path, DATASET_ARRAYS, recorded)
+            if arrays is not None:
+                dataset = assemble_dataset(spec, recorded, arrays)
+        extended = _extended_arrays(dataset, rows)
+        if extended is not None:
+            version, arrays = extended
+            arrays = map_arrays(spec.path, DATASET_ARRAYS, version, arrays)
+            if (mapped_arrays(spec.path, DATASET_ARRAYS, version) is None
+                    or not record_version(spec.path, version, 'Sheet1', COLUMNS)):
+                print(f"Rows appended to '{name}' are only served by this process")
+            dataset = assemble_dataset(spec, version, arrays)
+        dataset.bar_store
+        _datasets[name] = dataset
+    return dataset
+
+
+# Seconds between checks of the loaded workbooks for changes; 0 turns hot reloading off
+RELOAD_INTERVAL = float(os.environ.get('DATASET_RELOAD_INTERVAL', 30))
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def _watch(interval):
+    while True:
+        time.sleep(interval)
+        for name in list(_datasets):
+            try:
+                reload_dataset(name)
+            except Exception as e:
+                print(f"Error reloading dataset '{name}': {e}")
+
+
+def watch_datasets(interval=RELOAD_INTERVAL):
+    """Start the background thread that hot-reloads changed workbooks and appended rows, once per process."""
+    global _watcher
+    if interval <= 0:
+        return
+    with _watcher_lock:
+        if _watcher is None or _watcher[0] != os.getpid():
+            thread = threading.Thread(target=_watch, args=(interval,), name='dataset-watcher', daemon=True)
+            thread.start()
+            _watcher = (os.getpid(), thread)
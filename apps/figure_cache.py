@@ -0,0 +1,131 @@
+import functools
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from plotly.io.json import to_json_plotly
+
+from apps.shared_cache import SQLiteCache
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+# Most figures/results kept per worker before the least recently used one is dropped
+FIGURE_CACHE_SIZE = 256
+
+# Set FIGURE_CACHE_PATH to a file to share figures and results between the workers of one host
+SHARED_CACHE_PATH = os.environ.get('FIGURE_CACHE_PATH')
+SHARED_CACHE_TTL = float(os.environ.get('FIGURE_CACHE_TTL', 3600))
+SHARED_CACHE_MAX_MB = float(os.environ.get('FIGURE_CACHE_MAX_MB', 256))
+
+
+def _shared_key(key):
+    return json.dumps([sorted(part) if isinstance(part, frozenset) else part for part in key], default=str)
+
+
+class FigureCache:
+    """Size-bounded LRU cache for figure builders, with hit/miss/eviction counters.
+
+    With a `backend` (see apps.shared_cache) local misses are looked up there before building,
+    and every built value is stored there as JSON for the other workers.
+    """
+
+    def __init__(self, maxsize=FIGURE_CACHE_SIZE, backend=None):
+        self.maxsize = maxsize
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.shared_hits = 0
+
+    def _shared_get(self, key):
+        try:
+            value = self.backend.get(_shared_key(key))
+        except sqlite3.Error as e:
+            print(f"Shared figure cache unavailable: {e}")
+            return None
+        return None if value is None else _json_loads(value)
+
+    def _shared_set(self, key, value):
+        try:
+            self.backend.set(_shared_key(key), to_json_plotly(value).encode('utf-8'))
+        except sqlite3.Error as e:
+            print(f"Shared figure cache unavailable: {e}")
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        if self.backend is not None:
+            value = self._shared_get(key)
+            if value is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                self._store(key, value)
+                return value
+
+        # build outside the lock so slow builders don't serialise unrelated requests
+        value = build()
+        self._store(key, value)
+        if self.backend is not None:
+            self._shared_set(key, value)
+        return value
+
+    def track_version(self, dataset_key, version):
+        """Drop the entries of `dataset_key` once a different workbook version shows up."""
+        with self._lock:
+            if self._versions.get(dataset_key, version) == version:
+                self._versions[dataset_key] = version
+                return
+            self._versions[dataset_key] = version
+            stale = [key for key in self._entries if key[1] == dataset_key and key[2] != version]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions, 'shared_hits': self.shared_hits}
+
+
+figure_cache = FigureCache(backend=SQLiteCache(
+    SHARED_CACHE_PATH, ttl=SHARED_CACHE_TTL, max_bytes=int(SHARED_CACHE_MAX_MB * 1024 * 1024)
+) if SHARED_CACHE_PATH else None)
+
+
+def cached_figure(name):
+    """Memoise `build(dataset, selection=..., inputs=...)` in the shared figure cache.
+
+    Entries are keyed by (name, dataset id, dataset version, frozenset of selected clusters,
+    user-input vector), so a changed workbook never serves a figure of the old one.
+    """
+    def decorator(build):
+        @functools.wraps(build)
+        def wrapper(dataset, selection=None, inputs=None):
+            figure_cache.track_version(dataset.spec.key, dataset.version)
+            key = (name, dataset.spec.key, dataset.version,
+                   None if selection is None else frozenset(selection),
+                   None if inputs is None else tuple(inputs))
+            return figure_cache.get_or_build(key, lambda: build(dataset, selection=selection, inputs=inputs))
+        return wrapper
+    return decorator
@@ -0,0 +1,193 @@
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+
+# Highest red/green/blue value for a vertex at the maximum UTCI/GWP/LCC
+VERTEX_COLOR_SCALE = np.array([0, 101, 189])
+_HEX_BYTES = np.array([f'{value:02x}' for value in range(256)])
+
+# 为每个指标分配一个颜色
+INDICATOR_COLORS = {
+    'UTCI': 'red',
+    'GWP': 'green',
+    'LCC': 'blue'
+}
+UNSELECTED_COLOR = 'rgba(204, 204, 204, 0.7)'
+
+# Decimals kept of the values plotted from lists (box plots, bars, user markers); unset keeps them all.
+# Mesh coordinates are sent as float32 typed arrays, whose size doesn't depend on their digits.
+FIGURE_DECIMALS = int(os.environ['FIGURE_DECIMALS']) if os.environ.get('FIGURE_DECIMALS') else None
+
+
+def rounded(values):
+    """`values` as a list of floats, rounded to FIGURE_DECIMALS."""
+    values = np.asarray(values, dtype=np.float64)
+    return (values if FIGURE_DECIMALS is None else np.round(values, FIGURE_DECIMALS)).tolist()
+
+
+def vertex_colors(x, y, z):
+    """Colour every vertex by its share of the maximum UTCI/GWP/LCC, as '#rrggbb' strings."""
+    points = np.column_stack([x, y, z]).astype(np.float64)
+    # truncate like int() did, then clamp the way plotly clamps out-of-range rgb() channels
+    channels = np.trunc(VERTEX_COLOR_SCALE * points / points.max(axis=0))
+    channels = np.clip(channels, 0, 255).astype(np.uint8)
+    hex_channels = _HEX_BYTES[channels]
+    # a list: plotly's orjson path converts numpy string arrays element by element, lists at native speed
+    return np.char.add(np.char.add(np.char.add('#', hex_channels[:, 0]), hex_channels[:, 1]),
+                       hex_channels[:, 2]).tolist()
+
+
+def mesh_figure(df, triangles=None):
+    """Build the Handlungsspielraum figure; pages embed the result as a static figure.
+
+    `triangles` holds precomputed i/j/k vertex indices, so browsers don't triangulate themselves.
+    """
+    if df.empty:
+        return {}
+
+    x = df['UTCI']
+    y = df['GWP']
+    z = df['LCC']
+
+    # assign color according to the value of x, y, z
+    colors = vertex_colors(x, y, z)
+
+    # create mesh 3d
+    mesh = go.Mesh3d(x=x, y=y, z=z, colorbar_title='intensity', vertexcolor=colors, opacity=0.7, colorscale=None)
+    if triangles is not None:
+        mesh.update(i=triangles[:, 0], j=triangles[:, 1], k=triangles[:, 2])
+
+    layout = go.Layout(
+        scene=dict(aspectmode="cube"),
+        title={
+            'text': 'Handlungsspielraum',
+            'y': 0.9,  # define the 'y' coordinate of title
+            'x': 0.5,  # in the middle
+            'xanchor': 'center',
+            'yanchor': 'top',
+
+        },
+        # keep the camera the user chose when the page content is re-rendered
+        uirevision='mesh',
+    )
+
+    # title of x,y,z
+    layout.scene.xaxis.title = 'UTCI'
+    layout.scene.yaxis.title = 'GWP'
+    layout.scene.zaxis.title = 'LCC'
+
+    fig = go.Figure(data=[mesh], layout=layout)
+
+    fig.update_layout(
+        title=dict(text='Handlungsspielraum',
+                   font=dict(size=24,
+                             color='black',
+                             family='Arial, sans-serif',
+                             )
+
+                   )
+    )
+
+    return fig.to_dict()
+
+
+def box_trace(name, summary, column, points=None):
+    """One box drawn from precomputed statistics instead of the raw values.
+
+    Only the (capped) outliers are sent, unless `points` holds a capped sample of raw values to show.
+    """
+    sample = summary['outliers'][column] if points is None else points
+    stats = {key: rounded([summary[key][column]]) for key in ['q1', 'median', 'q3', 'lowerfence', 'upperfence']}
+    return go.Box(
+        x=[name], name=name, **stats,
+        y=[rounded(sample)], boxpoints='outliers' if points is None else 'all', jitter=0.3, pointpos=-1.8,
+    )
+
+
+def bar_colors(clusters, selected_clusters, indicator):
+    """Per-bar colours of one indicator trace: its own colour for selected clusters, grey otherwise."""
+    selected = set(selected_clusters or [])
+    return [INDICATOR_COLORS[indicator] if cluster in selected else UNSELECTED_COLOR for cluster in clusters]
+
+
+def bar_figure(normalized_avg_df):
+    """Einordnung der cluster: one trace per indicator, nothing highlighted yet."""
+    clusters = list(normalized_avg_df.index)
+    return {
+        'data': [
+            {
+                'type': 'bar',
+                'x': [f"Cluster{cluster}" for cluster in clusters],
+                'y': rounded(normalized_avg_df[indicator]),
+                'name': indicator,
+                'marker': {'color': bar_colors(clusters, [], indicator)},
+            }
+            for indicator in normalized_avg_df.columns
+        ],
+        'layout': {
+            'title': {'text': 'Einordnung der cluster',
+                      'font':
+                          {
+                              'size': 24,
+                              'color': 'black',
+                              'family': 'Arial, sans-serif',
+                              'weight': 'bold'
+                          }},
+            'xaxis': {'title': 'Cluster'},
+            'yaxis': {
+                'title': 'Ereignis der Aspekte',
+                'tickvals': [0, 0.5, 1],
+                'ticktext': ['Gut', 'Mittel', 'Schlecht']
+            },
+            'barmode': 'group',
+            'bargap': 0.000001,
+            'bargroupgap': 0.001,
+
+        }
+    }
+
+
+def bar_store(normalized_avg_df):
+    """Everything the clientside highlight callback needs to colour the bar chart in the browser."""
+    return {
+        'figure': bar_figure(normalized_avg_df),
+        'clusters': list(normalized_avg_df.index),
+        'colors': [INDICATOR_COLORS[indicator] for indicator in normalized_avg_df.columns],
+        'unselected': UNSELECTED_COLOR,
+    }
+
+
+def user_markers(names, values=None):
+    """Red dots at the user's normalised input values; empty until Find Best Cluster succeeded."""
+    return {
+        'type': 'scatter',
+        'x': list(names) if values else [],
+        'y': rounded(values) if values else [],
+        'mode': 'markers',
+        'marker': {'color': 'red', 'size': 10},
+    }
+
+
+def box_figure(names, summary, points=None):
+    """Box Plots for Selected Clusters.
+
+    Trace 0 is always the user marker trace, so the markers can be patched without resending the boxes.
+    """
+    traces = [user_markers(names)]
+    if summary is not None:
+        traces += [box_trace(name, summary, column, None if points is None else points[:, column]).to_plotly_json()
+                   for column, name in enumerate(names)]
+    return {
+        'data': traces,
+        'layout': go.Layout(
+            title=dict(text="Box Plots for Selected Clusters",
+                       font={'size': 24, 'color': "black", 'family': "Arial, sans-serif"}),
+            yaxis=dict(title="Normalized Value", tickvals=[0, 0.5, 1], ticktext=['Low', 'Medium', 'High']),
+            xaxis=dict(title="Parameters"),
+            showlegend=False,
+            margin=dict(l=80, r=40, t=40, b=120),  # Fixed margins
+            height=600,  # Fixed height
+            width=1500  # Fixed width
+        ).to_plotly_json()
+    }
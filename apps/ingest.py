@@ -0,0 +1,148 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Rows held in memory per chunk while streaming an export
+CHUNK_SIZE = 50000
+
+
+def _xlsx_chunks(path, columns, sheet_name, chunksize):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise ValueError(f"Some essential columns are missing from the Excel sheet: {', '.join(missing)}")
+        positions = [header.index(column) for column in columns]
+
+        chunk = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            chunk.append([row[position] if position < len(row) else None for position in positions])
+            if len(chunk) == chunksize:
+                yield np.array(chunk, dtype=np.float64)
+                chunk = []
+        if chunk:
+            yield np.array(chunk, dtype=np.float64)
+    finally:
+        workbook.close()
+
+
+def _csv_chunks(path, columns, chunksize):
+    try:
+        reader = pd.read_csv(path, usecols=columns, chunksize=chunksize)
+    except ValueError as e:
+        raise ValueError(f"Some essential columns are missing from the CSV file: {e}")
+    for chunk in reader:
+        yield chunk[columns].to_numpy(dtype=np.float64)
+
+
+def _parquet_chunks(path, columns, chunksize):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    missing = [column for column in columns if column not in parquet_file.schema_arrow.names]
+    if missing:
+        raise ValueError(f"Some essential columns are missing from the Parquet file: {', '.join(missing)}")
+    for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+        yield np.column_stack([batch.column(column).to_numpy(zero_copy_only=False).astype(np.float64)
+                               for column in columns])
+
+
+def iter_chunks(path, columns, sheet_name='Sheet1', chunksize=CHUNK_SIZE):
+    """Yield (rows, len(columns)) float arrays of only `columns`, reading CSV, Parquet or xlsx row by row."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return _csv_chunks(path, columns, chunksize)
+    if extension == '.parquet':
+        return _parquet_chunks(path, columns, chunksize)
+    return _xlsx_chunks(path, columns, sheet_name, chunksize)
+
+
+class RunningStats:
+    """Column minima/maxima and per-cluster sums and value counts, updated chunk by chunk.
+
+    Empty (NaN) values are left out of every statistic, as pandas does; every row needs a cluster.
+    """
+
+    def __init__(self, columns, cluster_column='cluster'):
+        self.columns = list(columns)
+        self._cluster = self.columns.index(cluster_column)
+        self.count = 0
+        self.min = np.full(len(self.columns), np.inf)
+        self.max = np.full(len(self.columns), -np.inf)
+        self._cluster_counts = {}
+        self._cluster_value_counts = {}
+        self._cluster_sums = {}
+
+    def update(self, chunk):
+        if len(chunk) == 0:
+            return
+        self.count += len(chunk)
+        self.min = np.fmin(self.min, np.nanmin(chunk, axis=0))
+        self.max = np.fmax(self.max, np.nanmax(chunk, axis=0))
+        clusters, codes = np.unique(chunk[:, self._cluster], return_inverse=True)
+        codes = codes.ravel()
+        counts = np.bincount(codes, minlength=len(clusters))
+        present = ~np.isnan(chunk)
+        value_counts = np.zeros((len(clusters), len(self.columns)), dtype=np.int64)
+        np.add.at(value_counts, codes, present)
+        sums = np.zeros((len(clusters), len(self.columns)))
+        np.add.at(sums, codes, np.where(present, chunk, 0.0))
+        for cluster, count, value_count, total in zip(clusters, counts, value_counts, sums):
+            self._cluster_counts[cluster] = self._cluster_counts.get(cluster, 0) + count
+            self._cluster_value_counts[cluster] = self._cluster_value_counts.get(cluster, 0) + value_count
+            self._cluster_sums[cluster] = self._cluster_sums.get(cluster, 0) + total
+
+    def min_series(self):
+        return pd.Series(self.min, index=self.columns)
+
+    def max_series(self):
+        return pd.Series(self.max, index=self.columns)
+
+    def cluster_totals(self):
+        """Return (sorted cluster labels, row counts, non-empty values per column, column sums).
+
+        The cluster column is left out of the value counts and sums.
+        """
+        clusters = sorted(self._cluster_counts)
+        counts = np.array([self._cluster_counts[c] for c in clusters], dtype=np.int64)
+        value_counts = np.array([self._cluster_value_counts[c] for c in clusters],
+                                dtype=np.int64).reshape(-1, len(self.columns))
+        sums = np.array([self._cluster_sums[c] for c in clusters]).reshape(-1, len(self.columns))
+        return (np.array(clusters).astype(np.int64), counts, np.delete(value_counts, self._cluster, axis=1),
+                np.delete(sums, self._cluster, axis=1))
+
+
+def read_columns(path, columns, sheet_name='Sheet1', chunksize=CHUNK_SIZE):
+    """Stream `columns` of an export into a dataframe, collecting RunningStats along the way.
+
+    Rows without a cluster are skipped.
+    """
+    stats = RunningStats(columns)
+    cluster = columns.index('cluster')
+    skipped = 0
+    # keep the chunks column by column so each column can be joined and its parts freed in turn
+    parts = [[] for _ in columns]
+    for chunk in iter_chunks(path, columns, sheet_name, chunksize):
+        labelled = ~np.isnan(chunk[:, cluster])
+        if not labelled.all():
+            skipped += int(len(chunk) - labelled.sum())
+            chunk = chunk[labelled]
+        stats.update(chunk)
+        for position, column_parts in enumerate(parts):
+            column_parts.append(chunk[:, position].copy())
+
+    data = {}
+    for position, column in enumerate(columns):
+        data[column] = np.concatenate(parts[position]) if parts[position] else np.empty(0)
+        parts[position] = None
+    data['cluster'] = data['cluster'].astype(np.int64)
+    if skipped:
+        print(f"Skipped {skipped} rows without a cluster in {path}")
+    return pd.DataFrame(data, copy=False), stats
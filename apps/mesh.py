@@ -0,0 +1,102 @@
+import numpy as np
+from scipy.spatial import ConvexHull, Delaunay, QhullError
+
+# 'delaunay' reproduces plotly's own default (a 2D Delaunay over UTCI/GWP, delaunayaxis='z'),
+# 'convex' is the convex hull and 'alpha' an alpha shape of the UTCI/GWP/LCC cloud
+TRIANGULATIONS = ('delaunay', 'convex', 'alpha')
+
+# Voxels per axis of the unit cube for each level of detail, finest first
+LOD_RESOLUTIONS = (128, 64, 32, 16, 8)
+
+
+def _unit_cube(points):
+    # the plot uses aspectmode='cube', so shape-dependent methods work on the same scaling
+    low = points.min(axis=0)
+    span = points.max(axis=0) - low
+    return (points - low) / np.where(span > 0, span, 1)
+
+
+def _circumradii(points, tetrahedra):
+    a, b, c, d = (points[tetrahedra[:, n]] for n in range(4))
+    # circumcentre relative to a solves 2 * [b-a; c-a; d-a] x = [|b-a|^2; |c-a|^2; |d-a|^2]
+    edges = np.stack([b - a, c - a, d - a], axis=1)
+    rhs = 0.5 * np.einsum('nij,nij->ni', edges, edges)
+    radii = np.full(len(tetrahedra), np.inf)
+    regular = np.abs(np.linalg.det(edges)) > 1e-12
+    if regular.any():
+        centres = np.linalg.solve(edges[regular], rhs[regular][:, :, None])[:, :, 0]
+        radii[regular] = np.linalg.norm(centres, axis=1)
+    return radii
+
+
+def _alpha_shape(points, alpha):
+    points = _unit_cube(points)
+    tetrahedra = Delaunay(points).simplices
+    kept = tetrahedra[_circumradii(points, tetrahedra) < 1.0 / alpha]
+
+    # the surface consists of the faces that belong to exactly one kept tetrahedron
+    faces = np.concatenate([kept[:, [0, 1, 2]], kept[:, [0, 1, 3]], kept[:, [0, 2, 3]], kept[:, [1, 2, 3]]])
+    unique, inverse, counts = np.unique(np.sort(faces, axis=1), axis=0, return_inverse=True, return_counts=True)
+    return faces[counts[inverse.ravel()] == 1]
+
+
+def voxel_decimate(points, resolution, keep=()):
+    """Return the sorted row positions that survive vertex clustering on a resolution^3 grid.
+
+    Each occupied voxel keeps the point closest to its centroid; the rows in `keep` always survive.
+    """
+    unit = _unit_cube(points)
+    cells = np.minimum((unit * resolution).astype(np.int64), resolution - 1)
+    keys = (cells[:, 0] * resolution + cells[:, 1]) * resolution + cells[:, 2]
+    _, voxel, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    voxel = voxel.ravel()
+
+    centroids = np.column_stack([np.bincount(voxel, weights=unit[:, axis]) for axis in range(3)]) / counts[:, None]
+    distances = np.linalg.norm(unit - centroids[voxel], axis=1)
+    order = np.lexsort((distances, voxel))
+    first_in_voxel = np.ones(len(order), dtype=bool)
+    first_in_voxel[1:] = voxel[order[1:]] != voxel[order[:-1]]
+    return np.union1d(order[first_in_voxel], keep).astype(np.int64)
+
+
+def detail_levels(points):
+    """Return the row positions of each decimated level, finest first; level 0 is the full point set.
+
+    The convex hull vertices are kept on every level so the extremes of the solution space survive.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    levels = [np.arange(len(points), dtype=np.int64)]
+    try:
+        boundary = ConvexHull(points).vertices
+    except (QhullError, ValueError):
+        boundary = ()
+    for resolution in LOD_RESOLUTIONS:
+        kept = voxel_decimate(points, resolution, boundary)
+        if len(kept) < len(levels[-1]):
+            levels.append(kept)
+    return levels
+
+
+def select_level(levels, vertex_budget):
+    """Return the index of the finest level within the vertex budget, or the coarsest level."""
+    for level, rows in enumerate(levels):
+        if len(rows) <= vertex_budget:
+            return level
+    return len(levels) - 1
+
+
+def triangulate(points, method='delaunay', alpha=2.0):
+    """Return an (n, 3) array of vertex indices triangulating the (m, 3) point cloud."""
+    points = np.asarray(points, dtype=np.float64)
+    if method not in TRIANGULATIONS:
+        raise ValueError(f"Unknown triangulation '{method}', expected one of {TRIANGULATIONS}.")
+    try:
+        if method == 'delaunay':
+            return Delaunay(points[:, :2]).simplices.astype(np.int32)
+        if method == 'convex':
+            return ConvexHull(points).simplices.astype(np.int32)
+        return _alpha_shape(points, alpha).astype(np.int32)
+    except (QhullError, ValueError) as e:
+        # too few or degenerate points: let plotly fall back to its own triangulation
+        print(f"Could not triangulate the mesh: {e}")
+        return None
@@ -0,0 +1,235 @@
+import bisect
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, g, request
+
+from app import app
+from apps.datasets import DATASETS
+from apps.figure_cache import figure_cache
+
+# Upper bounds of the latency (seconds) and response size (bytes) histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+UPDATE_PATH = app.config.routes_pathname_prefix + '_dash-update-component'
+# Most background jobs tracked from their dispatch at once; cancelled jobs never report back
+PENDING_JOBS = 1024
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class CallbackMetrics:
+    """Invocations, errors, latency and response size of every server-side callback, per dataset.
+
+    A background callback counts once, from the request that dispatched its job to the poll
+    that received the result; the polls in between are not counted. Each worker process keeps
+    its own numbers, so a job is only counted by the worker that dispatched it. Observing costs
+    a lock and two bisects.
+    """
+
+    def __init__(self, pending_jobs=PENDING_JOBS):
+        self._lock = threading.Lock()
+        self._series = {}
+        self.pending_jobs = pending_jobs
+        self._jobs = OrderedDict()
+
+    def start_job(self, handle, callback, dataset, started):
+        """Remember when the background job polled for under `handle` was dispatched."""
+        with self._lock:
+            self._jobs[handle] = (callback, dataset, started)
+            while len(self._jobs) > self.pending_jobs:
+                self._jobs.popitem(last=False)
+
+    def finish_job(self, handle):
+        """Return (callback, dataset, dispatch time) of the job polled for under `handle`, or None."""
+        with self._lock:
+            return self._jobs.pop(handle, None)
+
+    def observe(self, callback, dataset, seconds, size, error):
+        with self._lock:
+            series = self._series.get((callback, dataset))
+            if series is None:
+                series = self._series[(callback, dataset)] = {
+                    'invocations': 0, 'errors': 0,
+                    'latency': Histogram(LATENCY_BUCKETS), 'size': Histogram(SIZE_BUCKETS),
+                }
+            series['invocations'] += 1
+            series['errors'] += error
+            series['latency'].observe(seconds)
+            if size is not None:
+                series['size'].observe(size)
+
+    def render(self):
+        """The metrics in Prometheus' text exposition format."""
+        with self._lock:
+            series = sorted(((key, dict(value, latency=_copy(value['latency']), size=_copy(value['size'])))
+                             for key, value in self._series.items()), key=lambda item: item[0])
+        lines = [
+            '# HELP dash_callback_invocations_total Callback requests handled.',
+            '# TYPE dash_callback_invocations_total counter',
+        ]
+        lines += [f'dash_callback_invocations_total{{{_labels(*key)}}} {value["invocations"]}' for key, value in series]
+        lines += [
+            '# HELP dash_callback_errors_total Callback requests answered with an error status.',
+            '# TYPE dash_callback_errors_total counter',
+        ]
+        lines += [f'dash_callback_errors_total{{{_labels(*key)}}} {value["errors"]}' for key, value in series]
+        lines += [
+            '# HELP dash_callback_duration_seconds Time from receiving a callback request to its response, '
+            'or from dispatching a background job to the response carrying its result.',
+            '# TYPE dash_callback_duration_seconds histogram',
+        ]
+        for key, value in series:
+            lines += value['latency'].lines('dash_callback_duration_seconds', _labels(*key))
+        lines += [
+            '# HELP dash_callback_response_bytes Size of the callback response body.',
+            '# TYPE dash_callback_response_bytes histogram',
+        ]
+        for key, value in series:
+            lines += value['size'].lines('dash_callback_response_bytes', _labels(*key))
+        return '\n'.join(lines) + '\n'
+
+
+def _copy(histogram):
+    copy = Histogram(histogram.buckets)
+    copy.counts, copy.sum = list(histogram.counts), histogram.sum
+    return copy
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(callback, dataset):
+    return f'callback="{_escape(callback)}",dataset="{_escape(dataset)}"'
+
+
+callback_metrics = CallbackMetrics()
+
+
+def _first_id(outputs):
+    while isinstance(outputs, list):
+        if not outputs:
+            return None
+        outputs = outputs[0]
+    return outputs.get('id') if isinstance(outputs, dict) else None
+
+
+@functools.lru_cache(maxsize=None)
+def callback_label(callback):
+    """Name a callback by its first output, e.g. 'box-plot.figure' for a callback_map key.
+
+    Pattern-matching ids are named by their type; the '@...' suffix of duplicate outputs and
+    the '..a...b..' wrapping of multi-output callbacks are dropped, so every callback writing
+    the same first output shares a name.
+    """
+    output = callback[2:-2].split('...')[0] if callback.startswith('..') else callback
+    component, _, prop = output.partition('@')[0].rpartition('.')
+    if component.startswith('{'):
+        component = json.loads(component).get('type', component)
+    return f'{component}.{prop}'
+
+
+def _callback_labels(body):
+    # only labels the app knows about, so clients can't grow the number of series
+    callback = body.get('output') if isinstance(body, dict) else None
+    if callback not in app.callback_map:
+        return 'unknown', ''
+    component = _first_id(body.get('outputs'))
+    dataset = component.get('dataset') if isinstance(component, dict) else None
+    return callback, dataset if isinstance(dataset, str) and dataset in DATASETS else ''
+
+
+def _observe(callback, dataset, started, response):
+    callback_metrics.observe('unknown' if callback == 'unknown' else callback_label(callback), dataset,
+                             time.perf_counter() - started, response.calculate_content_length(),
+                             response.status_code >= 400)
+
+
+@app.server.before_request
+def _start_timer():
+    if request.path == UPDATE_PATH:
+        g.callback_started = time.perf_counter()
+
+
+def _is_background(callback):
+    spec = app.callback_map.get(callback)
+    return bool(spec and spec.get('background'))
+
+
+def _still_running(response):
+    # a poll of a running job gets at most its progress; the result arrives under "response"
+    return response.status_code == 200 and b'"response"' not in response.get_data()
+
+
+@app.server.after_request
+def _record_callback(response):
+    started = g.pop('callback_started', None)
+    if started is None:
+        return response
+    callback, dataset = _callback_labels(request.get_json(silent=True))
+    if _is_background(callback):
+        handle = request.args.get('cacheKey')
+        if handle is None:
+            # the dispatch: answered with the handle its polls carry
+            job = response.get_json(silent=True) if response.status_code == 200 else None
+            if isinstance(job, dict) and isinstance(job.get('cacheKey'), str):
+                callback_metrics.start_job(job['cacheKey'], callback, dataset, started)
+                return response
+        elif _still_running(response):
+            return response
+        else:
+            job = callback_metrics.finish_job(handle)
+            if job is None:
+                # dispatched by another worker, or too long ago
+                return response
+            callback, dataset, started = job
+    _observe(callback, dataset, started, response)
+    return response
+
+
+# (name, type, help) of the figure cache series, filled from FigureCache.stats
+FIGURE_CACHE_SERIES = (
+    ('hits', 'counter', 'Figures served from the in-process figure cache.'),
+    ('shared_hits', 'counter', 'Figures served from the shared cache of the workers.'),
+    ('misses', 'counter', 'Figures not in the in-process figure cache, shared hits included.'),
+    ('evictions', 'counter', 'Figures dropped from the in-process figure cache to make room.'),
+    ('size', 'gauge', 'Figures held by the in-process figure cache.'),
+    ('maxsize', 'gauge', 'Most figures the in-process figure cache holds.'),
+)
+
+
+def render_figure_cache(stats):
+    """The figure cache `stats` (see FigureCache.stats) in Prometheus' text exposition format."""
+    lines = []
+    for key, kind, description in FIGURE_CACHE_SERIES:
+        name = f'dash_figure_cache_{key}' + ('_total' if kind == 'counter' else '')
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}', f'{name} {stats[key]}']
+    return '\n'.join(lines) + '\n'
+
+
+@app.server.route('/metrics')
+def metrics():
+    return Response(callback_metrics.render() + render_figure_cache(figure_cache.stats()),
+                    mimetype='text/plain; version=0.0.4')
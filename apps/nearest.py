@@ -0,0 +1,37 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class NearestDesignIndex:
+    """KD-tree over the normalised parameter matrix of one dataset."""
+
+    def __init__(self, matrix, clusters, labels=None):
+        """`clusters` holds one cluster per row, or positions into `labels` if those are given.
+
+        Rows with an empty (NaN) value have no distance to anything and are never returned.
+        """
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float64)
+        self.clusters = np.asarray(clusters)
+        self.labels = None if labels is None else np.asarray(labels)
+        complete = np.isfinite(self.matrix).all(axis=1)
+        # positions of the rows in the tree, None when that is every row
+        self._rows = None if complete.all() else np.flatnonzero(complete)
+        self.tree = cKDTree(self.matrix if self._rows is None else self.matrix[self._rows])
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def query(self, points):
+        """Return (distances, row positions, clusters) of the nearest design for each point."""
+        points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+        distances, rows = self.tree.query(points, k=1)
+        if self._rows is not None:
+            rows = self._rows[rows]
+        clusters = self.clusters[rows]
+        return distances, rows, clusters if self.labels is None else self.labels[clusters]
+
+    @property
+    def nbytes(self):
+        # the tree shares the matrix and adds one row permutation; its nodes and `clusters` are left out
+        return self.matrix.nbytes + self.tree.indices.nbytes + (
+            0 if self._rows is None else self._rows.nbytes + self.tree.data.nbytes)
@@ -0,0 +1,61 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class SQLiteCache:
+    """Cache shared by all worker processes on one host, stored in a local SQLite file.
+
+    Values are bytes. Entries expire after `ttl` seconds, and once the stored values exceed
+    `max_bytes` the entries closest to expiry are dropped first.
+    """
+
+    def __init__(self, path, ttl=3600, max_bytes=256 * 1024 * 1024, prune_every=50):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS entries '
+                         '(key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, expires REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires)')
+
+    def _connect(self):
+        # one connection per thread and process: sqlite connections must not cross a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute('SELECT value FROM entries WHERE key = ? AND expires > ?',
+                                      (key, time.time())).fetchone()
+        return None if row is None else zlib.decompress(row[0])
+
+    def set(self, key, value):
+        value = zlib.compress(value, 1)
+        conn = self._connect()
+        conn.execute('INSERT OR REPLACE INTO entries (key, value, size, expires) VALUES (?, ?, ?, ?)',
+                     (key, value, len(value), time.time() + self.ttl))
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self):
+        conn = self._connect()
+        conn.execute('DELETE FROM entries WHERE expires <= ?', (time.time(),))
+        conn.execute('DELETE FROM entries WHERE key IN ('
+                     'SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY expires DESC, key) AS total FROM entries) '
+                     'WHERE total > ?)', (self.max_bytes,))
+
+    def clear(self):
+        self._connect().execute('DELETE FROM entries')
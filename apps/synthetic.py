@@ -0,0 +1,142 @@
+"""Synthetic exports with the schema of the dash_visu_export workbooks, for scale tests and benchmarks.
+
+    python -m apps.synthetic big_export.xlsx --rows 1000000 --clusters 20
+
+Designs are drawn around one centre per cluster in the normalised parameter space, with uneven
+cluster sizes, and scaled to the ranges the real exports cover. UTCI, GWP and LCC follow from
+the parameters through a fixed smooth model plus a per-cluster offset and noise, so clusters
+are separated in the indicator space too. Rows are generated and written chunk by chunk, in
+xlsx, CSV or Parquet depending on the file extension.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from apps.datasets import COLUMNS, indicators, parameters
+from apps.ingest import CHUNK_SIZE
+
+# (low, high) of every column, as covered by the sample exports
+COLUMN_RANGES = {
+    "Baumanteil [%]": (0.0, 1.0),
+    "PV-Dach [%]": (0.0, 1.0),
+    "PV battery capacity": (0.0, 50.0),
+    "PV-facade-% south": (0.3, 1.0),
+    "Fensterflächenanteil": (0.1, 0.5),
+    "Fenster g-Wert": (0.55, 0.85),
+    "Gründachstärke": (0.0, 0.25),
+    "Kronendurchmesser": (2.0, 10.0),
+    "Baumhöhe": (6.0, 9.5),
+    "Kronentransparenz Sommer": (0.1, 0.3),
+    "Kronentransparenz Winter": (0.45, 0.8),
+    "Albedo Fassade": (0.1, 0.6),
+    "Straßenbreite": (3.0, 9.0),
+    "PV Ost-West Fassade [%]": (0.0, 1.0),
+    'UTCI': (29.5, 34.5),
+    'GWP': (-3.0, 6.0),
+    'LCC': (640.0, 940.0),
+}
+FORMATS = ('.xlsx', '.csv', '.parquet')
+
+
+def _bounds(columns):
+    low, high = np.array([COLUMN_RANGES[column] for column in columns]).T
+    return low, high - low
+
+
+class ClusterModel:
+    """The random structure behind one synthetic export: cluster centres, sizes and the indicator model."""
+
+    def __init__(self, clusters, seed=0):
+        rng = np.random.default_rng(seed)
+        self.clusters = clusters
+        self.seed = seed
+        # a few big clusters and a tail of small ones, as in the sample exports
+        self.weights = rng.dirichlet(np.full(clusters, 2.0))
+        self.centres = rng.uniform(0.1, 0.9, (clusters, len(parameters)))
+        self.spreads = rng.uniform(0.04, 0.12, (clusters, 1))
+        self.coefficients = rng.normal(0, 1, (len(parameters), len(indicators))) / np.sqrt(len(parameters))
+        self.offsets = rng.normal(0, 0.4, (clusters, len(indicators)))
+
+    def rows(self, count, rng):
+        """Return `count` rows as a dataframe with COLUMNS."""
+        labels = rng.choice(self.clusters, size=count, p=self.weights)
+        normalized = np.clip(self.centres[labels] + rng.normal(0, 1, (count, len(parameters))) * self.spreads[labels],
+                             0, 1)
+        # tanh keeps the indicators inside their ranges without piling designs up at the bounds
+        signal = (normalized - 0.5) @ self.coefficients * 4 + self.offsets[labels]
+        indicator_share = 0.5 + 0.5 * np.tanh(signal + rng.normal(0, 0.1, signal.shape))
+
+        low, span = _bounds(parameters)
+        data = dict(zip(parameters, (low + normalized * span).T))
+        low, span = _bounds(indicators)
+        data.update(zip(indicators, (low + indicator_share * span).T))
+        data['cluster'] = labels.astype(np.int64)
+        return pd.DataFrame(data, columns=COLUMNS)
+
+
+def generate(rows, clusters, seed=0, chunksize=CHUNK_SIZE):
+    """Yield dataframes of at most `chunksize` rows, `rows` in total; the same arguments give the same rows."""
+    model = ClusterModel(clusters, seed)
+    for number, start in enumerate(range(0, rows, chunksize)):
+        yield model.rows(min(chunksize, rows - start), np.random.default_rng([seed, number]))
+
+
+def _write_xlsx(path, chunks):
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    sheet.append(COLUMNS)
+    for chunk in chunks:
+        for row in chunk.itertuples(index=False):
+            sheet.append(list(row))
+    workbook.save(path)
+
+
+def _write_csv(path, chunks):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for number, chunk in enumerate(chunks):
+            chunk.to_csv(f, index=False, header=number == 0)
+
+
+def _write_parquet(path, chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_export(path, rows, clusters, seed=0, chunksize=CHUNK_SIZE):
+    """Write a synthetic export of `rows` designs in `clusters` clusters; the format follows the extension."""
+    extension = os.path.splitext(path)[1].lower()
+    writers = {'.xlsx': _write_xlsx, '.csv': _write_csv, '.parquet': _write_parquet}
+    if extension not in writers:
+        raise ValueError(f"Unsupported export format '{extension}', expected one of {', '.join(FORMATS)}")
+    writers[extension](path, generate(rows, clusters, seed, chunksize))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('path', help=f"file to write, ending in {', '.join(FORMATS)}")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--clusters', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help='rows generated and written at a time')
+    args = parser.parse_args(argv)
+    write_export(args.path, args.rows, args.clusters, args.seed, args.chunksize)
+    print(f"Wrote {args.rows} rows in {args.clusters} clusters to {args.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+// Clientside callbacks: pure highlighting needs no round trip to the server
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    clusters: {
+        // Colour the bars of the selected clusters, using the data the page keeps in its bar store
+        highlightBars: function (selectedClusters, store) {
+            if (!store) {
+                return window.dash_clientside.no_update;
+            }
+            var selected = new Set((selectedClusters || []).map(String));
+            var data = store.figure.data.map(function (trace, index) {
+                var colors = store.clusters.map(function (cluster) {
+                    return selected.has(String(cluster)) ? store.colors[index] : store.unselected;
+                });
+                return Object.assign({}, trace, {marker: Object.assign({}, trace.marker, {color: colors})});
+            });
+            return Object.assign({}, store.figure, {data: data});
+        }
+    }
+});
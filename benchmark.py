@@ -0,0 +1,306 @@
+"""Benchmark the page callbacks and the dataset load against synthetic exports (see apps.synthetic).
+
+Every callback is called through Dash's HTTP endpoint with Flask's test client, so the timings
+include serialising the response. For each export size and cluster count this records the median
+wall time, the peak memory traced by tracemalloc (Python objects and numpy arrays, not scipy's
+C++ trees) and the size of the serialised response, or for the loads the dataset's own memory
+usage, and writes them as JSON (by default to benchmark.json, which git ignores):
+
+    python benchmark.py --output benchmark.json
+    python benchmark.py --sizes 1000 10000 --baseline benchmark.json
+
+With --encoding the JSON encoding of the mesh and of a box plot of all clusters is measured
+instead, for the sample workbooks and the synthetic exports: with the stdlib and with the
+orjson engine, once at full precision and once with plotted values rounded (see
+apps.figures.FIGURE_DECIMALS):
+
+    python benchmark.py --encoding 4 --sizes 100000 --clusters 20
+
+With --baseline every result is compared with the matching one of an earlier run, and the
+exit status is 1 if any wall time got slower than the tolerance allows.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+# callbacks are timed inline, and the synthetic exports must not be swapped out while running
+os.environ['BACKGROUND_CALLBACKS'] = '0'
+os.environ['DATASET_RELOAD_INTERVAL'] = '0'
+os.environ.pop('FIGURE_CACHE_PATH', None)
+
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+# sets the app's layout and registers every callback
+import index  # noqa: F401
+from app import app
+from apps import figures
+from apps.data_visualisation import component_id, layout
+from apps.datasets import DATASETS, DatasetSpec, build_mesh, get_dataset, load_dataset, parameters, \
+    register_dataset, unload_dataset
+from apps.figure_cache import figure_cache
+from apps.synthetic import COLUMN_RANGES, write_export
+
+SIZES = [1000, 10000, 100000, 1000000]
+CLUSTERS = [5, 20, 100]
+# sizes a result may record, see Bench.measure: (field, label in comparisons)
+SIZE_METRICS = (('response_bytes', 'bytes'), ('dataset_bytes', 'dataset'))
+# JSON engines compared by --encoding, plain first
+ENGINES = ['json', 'orjson']
+
+
+def _callback_key(fragment):
+    keys = [key for key in app.callback_map if fragment in key]
+    if len(keys) != 1:
+        raise LookupError(f"Expected one callback for '{fragment}', found {keys}")
+    return keys[0]
+
+
+class Bench:
+    """Runs the cases of one synthetic export."""
+
+    def __init__(self, spec, repeat):
+        self.spec = spec
+        self.key = spec.key
+        self.repeat = repeat
+        self.client = app.server.test_client()
+        self.cache_dir = os.path.join(os.path.dirname(spec.path), '.cache')
+        rng = np.random.default_rng(1)
+        self.inputs = [float(rng.uniform(*COLUMN_RANGES[parameter])) for parameter in parameters]
+
+    def _post(self, output_key, outputs, inputs, state=()):
+        response = self.client.post('/_dash-update-component', json={
+            'output': output_key, 'outputs': outputs, 'inputs': list(inputs), 'state': list(state),
+            'changedPropIds': [],
+        })
+        if response.status_code != 200:
+            raise RuntimeError(f"{output_key} answered {response.status_code}: {response.data[:200]}")
+        return len(response.data)
+
+    def _prop(self, kind, prop, value=None, **extra):
+        entry = {'id': component_id(kind, self.key, **extra), 'property': prop}
+        if value is not None:
+            entry['value'] = value
+        return entry
+
+    def reset(self, mesh_cache=True):
+        """Start from a freshly mapped dataset and an empty figure cache, as a new worker would."""
+        if mesh_cache:
+            for path in glob.glob(os.path.join(self.cache_dir, '*.npz')):
+                os.remove(path)
+        figure_cache.clear()
+        unload_dataset(self.key)
+        get_dataset(self.key)
+
+    def measure(self, name, run, setup=None, size='response_bytes'):
+        """Median wall time of `repeat` runs, then one more run traced for its peak memory.
+
+        `run` returns a size in bytes, recorded under `size`.
+        """
+        times, value = [], None
+        for _ in range(self.repeat + 1):
+            if setup is not None:
+                setup()
+            traced = len(times) == self.repeat
+            if traced:
+                tracemalloc.start()
+            start = time.perf_counter()
+            value = run()
+            elapsed = time.perf_counter() - start
+            if traced:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                times.append(elapsed)
+        return {'callback': name, 'wall_time': statistics.median(times), 'times': times,
+                'peak_memory': peak, size: value}
+
+    def load_cold(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        return load_dataset(self.spec).memory_usage()['total']
+
+    def load_mapped(self):
+        return load_dataset(self.spec).memory_usage()['total']
+
+    def page_layout(self):
+        return len(to_json_plotly(layout(self.spec)))
+
+    def mesh(self):
+        # the build a page waits for, then the response of its poll once the mesh is there
+        build_mesh(get_dataset(self.key))
+        return self._post(_callback_key('3d-mesh-plot'),
+                          [self._prop('3d-mesh-plot', 'figure'), self._prop('mesh-poll', 'disabled'),
+                           self._prop('mesh-progress', 'children')],
+                          [self._prop('mesh-poll', 'n_intervals', 0)])
+
+    def box_plot(self):
+        selected = get_dataset(self.key).clusters[:3]
+        return self._post('{"dataset":["MATCH"],"type":"box-plot"}.figure', self._prop('box-plot', 'figure'),
+                          [self._prop('cluster-dropdown', 'value', selected)],
+                          [{'id': component_id('user-input-store', self.key), 'property': 'data', 'value': None}])
+
+    def best_cluster(self):
+        # the inline lookup; the background variant of large exports writes to '.children@...'
+        return self._post(_callback_key('"best-cluster-output"}.children.'),
+                          [self._prop('best-cluster-output', 'children'), self._prop('user-input-store', 'data')],
+                          [self._prop('submit-button', 'n_clicks', 1)],
+                          [[self._prop('input', 'value', value, index=position)
+                            for position, value in enumerate(self.inputs)]])
+
+    def user_markers(self):
+        markers = get_dataset(self.key).normalize_inputs(self.inputs).tolist()
+        return self._post(_callback_key('figure@'), self._prop('box-plot', 'figure'),
+                          [self._prop('user-input-store', 'data', markers)])
+
+    def run(self):
+        results = [
+            self.measure('load_dataset (cold)', self.load_cold, size='dataset_bytes'),
+            self.measure('load_dataset (mapped)', self.load_mapped, size='dataset_bytes'),
+        ]
+        # the page itself, with the mesh it embeds already built
+        results.append(self.measure('layout', self.page_layout, lambda: (self.reset(), build_mesh(get_dataset(self.key)))))
+        results += [self.measure(name, run, self.reset) for name, run in [
+            ('build_mesh_plot', self.mesh),
+            ('update_box_plot', self.box_plot),
+            ('find_best_cluster', self.best_cluster),
+            ('update_user_markers', self.user_markers),
+        ]]
+        # the mesh as every later visitor gets it: arrays from disk, figure built once per worker
+        self.mesh()
+        results.append(self.measure('build_mesh_plot (cached arrays)', self.mesh,
+                                    lambda: self.reset(mesh_cache=False)))
+        return self._label(results)
+
+    def _label(self, results):
+        dataset = get_dataset(self.key)
+        for result in results:
+            result.update(dataset=self.key, rows=len(dataset), clusters=len(dataset.clusters))
+        return results
+
+    def run_encoding(self, decimals):
+        """Time encoding the mesh and a box plot of all clusters with every engine, with and without rounding."""
+        dataset = get_dataset(self.key)
+        results = []
+        for rounding in [None, decimals]:
+            figures.FIGURE_DECIMALS = rounding
+            built = {
+                'mesh_figure': dataset.mesh_figure,
+                'box_figure': figures.box_figure(parameters, dataset.box_stats.summary(dataset.clusters)),
+            }
+            for engine in ENGINES:
+                for name, figure in built.items():
+                    label = f"encode {name} ({engine}, {'all' if rounding is None else rounding} decimals)"
+                    results.append(self.measure(label, lambda: len(to_json_plotly(figure, engine=engine).encode())))
+        figures.FIGURE_DECIMALS = None
+        return self._label(results)
+
+
+def _describe(result):
+    return f"{result['dataset']:<18} {result['rows']:>8} rows {result['clusters']:>4} clusters  {result['callback']:<46}"
+
+
+def _run(bench, decimals):
+    results = bench.run() if decimals is None else bench.run_encoding(decimals)
+    for result in results:
+        size = ''.join(f" {result[field]:>12} B" + ('' if field == 'response_bytes' else f' ({label})')
+                       for field, label in SIZE_METRICS if field in result)
+        print(f"{_describe(result)} {result['wall_time'] * 1000:>10.1f} ms "
+              f"{result['peak_memory'] / 2 ** 20:>9.1f} MiB{size}")
+    return results
+
+
+def run_benchmarks(sizes, clusters, repeat, directory, decimals=None):
+    """Benchmark the callbacks, or with `decimals` the JSON encoding, of a synthetic export of every size.
+
+    The encoding is measured on the sample workbooks too.
+    """
+    results = []
+    if decimals is not None:
+        for spec in list(DATASETS.values()):
+            results += _run(Bench(spec, repeat), decimals)
+    for rows in sizes:
+        for count in clusters:
+            path = os.path.join(directory, f'synthetic_{rows}_{count}.csv')
+            write_export(path, rows, count)
+            spec = DatasetSpec(f'bench-{rows}-{count}', f'Synthetic {rows} x {count}', path)
+            register_dataset(spec)
+            results += _run(Bench(spec, repeat), decimals)
+            unload_dataset(spec.key)
+    return results
+
+
+def _case(result):
+    return result['callback'], result['dataset']
+
+
+def compare(results, baseline, tolerance):
+    """Print every result against the matching baseline; return the ones slower than the tolerance allows."""
+    previous = {_case(result): result for result in baseline['results']}
+    slower = []
+    for result in results:
+        before = previous.get(_case(result))
+        if before is None:
+            continue
+        # a baseline written before the loads recorded dataset_bytes has no size to compare with
+        ratios = {metric: result[metric] / before[metric] if before.get(metric) else float('nan')
+                  for metric in ['wall_time', 'peak_memory'] + [field for field, _ in SIZE_METRICS if field in result]}
+        flag = ''
+        if ratios['wall_time'] > 1 + tolerance:
+            slower.append(result)
+            flag = '  SLOWER'
+        print(f"{_describe(result)} time x{ratios['wall_time']:.2f}  memory x{ratios['peak_memory']:.2f}  "
+              + '  '.join(f"{label} x{ratios[field]:.2f}" for field, label in SIZE_METRICS if field in ratios)
+              + flag)
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='rows of the synthetic exports')
+    parser.add_argument('--clusters', type=int, nargs='+', default=CLUSTERS, help='clusters per export')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case')
+    parser.add_argument('--output', default='benchmark.json', help='where to write the results')
+    parser.add_argument('--baseline', help='results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative slow-down against the baseline')
+    parser.add_argument('--encoding', type=int, metavar='DECIMALS', nargs='?', const=4,
+                        help='benchmark the JSON encoding of the figures instead, rounding to DECIMALS (default 4)')
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix='dash-benchmark-')
+    try:
+        results = run_benchmarks(args.sizes, args.clusters, args.repeat, directory, args.encoding)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            slower = compare(results, json.load(f), args.tolerance)
+        if slower:
+            print(f"{len(slower)} results are more than {args.tolerance:.0%} slower than {args.baseline}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,7 +3,9 @@ from dash import html, dcc
 from dash.dependencies import Input, Output
 
 from app import app
-import apps.homepage, apps.data_visualisation_house, apps.data_visualisation_room, apps.data_visualisation_city
+# The page module only registers callbacks on import; datasets load on the first visit
+import apps.homepage, apps.data_visualisation, apps.api, apps.metrics
+from apps.datasets import DATASETS
 
 app.layout = html.Div([
     dcc.Location(id='url', refresh=False),
@@ -18,11 +20,11 @@ def display_page(pathname):
         if pathname == '/app1':
             return apps.homepage.layout
         elif pathname == '/app2':
-            return apps.data_visualisation_house.layout
+            return apps.data_visualisation.layout(DATASETS['house'])
         elif pathname == '/app3':
-            return apps.data_visualisation_city.layout
+            return apps.data_visualisation.layout(DATASETS['city'])
         elif pathname == '/app4':
-            return apps.data_visualisation_room.layout
+            return apps.data_visualisation.layout(DATASETS['room'])
         else:
             return apps.homepage.layout  # default 'app1'
     except Exception as e: